@@ -6,12 +6,16 @@ import com.google.gson.Gson
 import com.screenshot.monitor.model.StatusResponse
 import okhttp3.OkHttpClient
 import okhttp3.Request
+import java.util.concurrent.ConcurrentHashMap
 import java.util.concurrent.TimeUnit
 
 class ApiService(private val context: Context) {
 
     companion object {
         private const val TAG = "ApiService"
+
+        // 每个 URL 上次的 ETag 和响应，服务器返回 304 时直接复用
+        private val etagCache = ConcurrentHashMap<String, Pair<String, StatusResponse>>()
     }
 
     private val client = OkHttpClient.Builder()
@@ -51,19 +55,34 @@ class ApiService(private val context: Context) {
 
             Log.d(TAG, "Requesting URL: $url on Android ${android.os.Build.VERSION.SDK_INT}")
 
-            val request = Request.Builder()
+            val cached = etagCache[url]
+            val requestBuilder = Request.Builder()
                 .url(url)
                 .get()
-                .build()
+            if (cached != null) {
+                requestBuilder.header("If-None-Match", cached.first)
+            }
+            val request = requestBuilder.build()
 
             val response = client.newCall(request).execute()
             Log.d(TAG, "Response code: ${response.code}, successful: ${response.isSuccessful}")
 
-            if (response.isSuccessful) {
+            if (response.code == 304 && cached != null) {
+                // 状态未变化，不再下载和解析响应体
+                response.close()
+                cached.second
+            } else if (response.isSuccessful) {
                 val body = response.body?.string()
                 if (body != null) {
                     Log.d(TAG, "Response body: $body")
-                    gson.fromJson(body, StatusResponse::class.java)
+                    val status = gson.fromJson(body, StatusResponse::class.java)
+                    val etag = response.header("ETag")
+                    if (etag != null) {
+                        etagCache[url] = Pair(etag, status)
+                    } else {
+                        etagCache.remove(url)
+                    }
+                    status
                 } else {
                     Log.w(TAG, "Response body is null")
                     null
@@ -0,0 +1,87 @@
+"""
+API Encoding
+Web API 响应的紧凑编码：
+
+- ?fields=a,b,c.d 只返回需要的字段（c.d 表示列表 c 中每一项只保留 d）
+- Accept: application/msgpack 返回 MessagePack（需安装 msgpack）
+- Accept: application/vnd.screenshot-status 返回 /api/status 的固定布局二进制帧（6 字节）
+- Accept-Encoding: gzip 时压缩较大的响应（文件列表、服务器汇总等）
+
+未指定时仍返回原来的 JSON。
+"""
+
+import gzip
+import struct
+
+try:
+    import msgpack
+except ImportError:  # 未安装 msgpack 时只提供 JSON 和二进制帧
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+STATUS_FRAME_MIMETYPE = 'application/vnd.screenshot-status'
+
+# 二进制帧: 版本(1 字节) | 状态(1 字节，0 无 / 1 有) | 文件总数(4 字节无符号整数，大端)
+STATUS_FRAME = struct.Struct('>BBI')
+STATUS_FRAME_VERSION = 1
+
+# 小于该字节数的响应不压缩（压缩头和 CPU 开销不划算）
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+COMPRESSIBLE_MIMETYPES = {JSON_MIMETYPE, *MSGPACK_MIMETYPES, 'text/plain', 'text/html'}
+
+
+def parse_fields(fields):
+    """把 "a,b,c.d" 解析为 {"a": None, "b": None, "c": {"d": None}}（None 表示整个字段）"""
+    tree = {}
+    for field in fields.split(','):
+        parts = [part for part in field.strip().split('.') if part]
+        if not parts:
+            continue
+        node = tree
+        for part in parts[:-1]:
+            child = node.get(part, {})
+            if child is None:
+                # 已选择整个字段，更细的选择没有意义
+                break
+            node = node.setdefault(part, child)
+        else:
+            node[parts[-1]] = None
+    return tree
+
+
+def project(data, tree):
+    """按 parse_fields 的结果裁剪数据；列表中的每一项分别裁剪，不存在的字段忽略"""
+    if isinstance(data, list):
+        return [project(item, tree) for item in data]
+    if not isinstance(data, dict):
+        return data
+    result = {}
+    for key, subtree in tree.items():
+        if key in data:
+            result[key] = data[key] if subtree is None else project(data[key], subtree)
+    return result
+
+
+def encode_status_frame(has_folders, total_count):
+    return STATUS_FRAME.pack(STATUS_FRAME_VERSION, int(bool(has_folders)), total_count)
+
+
+def offered_mimetypes(status_frame=False):
+    """可提供的编码（按优先顺序，JSON 在前，Accept: */* 时返回 JSON）"""
+    offered = [JSON_MIMETYPE]
+    if msgpack is not None:
+        offered.extend(MSGPACK_MIMETYPES)
+    if status_frame:
+        offered.append(STATUS_FRAME_MIMETYPE)
+    return offered
+
+
+def pack_msgpack(data):
+    return msgpack.packb(data, use_bin_type=True)
+
+
+def gzip_body(body):
+    """压缩响应体；mtime=0 使相同内容的压缩结果相同"""
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
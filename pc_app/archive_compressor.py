@@ -0,0 +1,232 @@
+"""
+Archive Compressor
+把归档中的 PNG / BMP 截图无损重新编码（优化的 PNG 或无损 WebP），减小同步到 OneDrive 的体积。
+
+- 编码在低优先级的子进程池中进行，进程数按 CPU 核数的比例封顶，不占用托盘的界面线程
+- 每个文件的处理状态记录在 SQLite 中（与 servers.json 同目录），中断后重启会继续处理未完成的文件
+- 新文件解码后与原图逐像素比较，一致且更小时才替换原文件，并保留原文件的修改时间和创建时间
+"""
+
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # 未安装 Pillow 时不启用压缩
+    Image = None
+
+from metrics import COMPRESS_FILES, COMPRESS_SAVED_BYTES
+
+# 压缩模式（.env 中 ARCHIVE_COMPRESS）：png 优化 PNG，webp 无损 WebP，其他值不压缩
+COMPRESS_MODES = {'png': ('PNG', '.png'), 'webp': ('WEBP', '.webp')}
+SOURCE_EXTENSIONS = {'.png', '.bmp'}
+# 每次从数据库取出的待处理文件数
+CHUNK_SIZE = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    path TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    bytes_before INTEGER,
+    bytes_after INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+"""
+
+
+def _lower_priority():
+    """进程池初始化：把子进程调到低优先级"""
+    if os.name == 'nt':
+        import ctypes
+        BELOW_NORMAL_PRIORITY_CLASS = 0x00004000
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+    else:
+        os.nice(10)
+
+
+def _restore_times(path, st):
+    """把原文件的访问 / 修改时间（Windows 上还有创建时间）写回新文件
+
+    重新编码生成的是新文件，创建时间是 "现在"；分片按创建时间（Windows 的 st_ctime）归类，
+    不还原的话之后 --reshard 会把压缩过的截图都归到当前月份
+    """
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    if os.name != 'nt':
+        # 其他系统上 st_ctime 是元数据变更时间，无法设置；分片改用修改时间（见 archive_layout）
+        return
+    import ctypes
+    from ctypes import wintypes
+    FILE_WRITE_ATTRIBUTES = 0x0100
+    FILE_SHARE_ALL = 0x00000007
+    OPEN_EXISTING = 3
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.CreateFileW.restype = wintypes.HANDLE
+    handle = kernel32.CreateFileW(path, FILE_WRITE_ATTRIBUTES, FILE_SHARE_ALL, None, OPEN_EXISTING, 0, None)
+    if handle is None or handle == wintypes.HANDLE(-1).value:
+        raise ctypes.WinError(ctypes.get_last_error())
+    try:
+        # FILETIME: 自 1601-01-01 起的 100 纳秒数
+        ticks = st.st_ctime_ns // 100 + 116444736000000000
+        created = wintypes.FILETIME(ticks & 0xFFFFFFFF, ticks >> 32)
+        if not kernel32.SetFileTime(handle, ctypes.byref(created), None, None):
+            raise ctypes.WinError(ctypes.get_last_error())
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _pixels(image):
+    mode = 'RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB'
+    return image.convert(mode).tobytes()
+
+
+def _recompress(src, mode):
+    """在子进程中重新编码一个文件，返回 (状态, 新路径, 原字节数, 新字节数)
+
+    状态: done 已替换；skipped 新文件不更小或不是无损的，保留原文件
+    """
+    pil_format, suffix = COMPRESS_MODES[mode]
+    before = os.path.getsize(src)
+    dest = os.path.splitext(src)[0] + suffix
+    # 固定的临时文件名：中断后重新处理同一文件时会覆盖上次残留的临时文件
+    tmp = f"{dest}.tmp"
+    try:
+        with Image.open(src) as image:
+            original = _pixels(image)
+            if pil_format == 'PNG':
+                image.save(tmp, 'PNG', optimize=True)
+            else:
+                image.save(tmp, 'WEBP', lossless=True, method=6)
+        after = os.path.getsize(tmp)
+        with Image.open(tmp) as encoded:
+            identical = _pixels(encoded) == original
+        if after >= before or not identical or (dest != src and os.path.exists(dest)):
+            os.remove(tmp)
+            return 'skipped', src, before, before
+
+        st = os.stat(src)
+        os.replace(tmp, dest)
+        _restore_times(dest, st)
+        if dest != src:
+            os.remove(src)
+        return 'done', dest, before, after
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class ArchiveCompressor:
+    """归档重新编码队列
+
+    db_path: 进度数据库路径
+    mode: 'png' 或 'webp'
+    cpu_fraction: 最多使用的 CPU 核数比例
+    on_replaced: 回调 on_replaced([(原路径, 新路径), ...])，每批替换完成后在后台线程中调用；
+                 原地重新编码（扩展名不变）时两个路径相同，文件大小和内容已变化
+    """
+
+    def __init__(self, db_path, mode='webp', cpu_fraction=0.5, on_replaced=None):
+        if mode not in COMPRESS_MODES:
+            raise ValueError(f"未知的压缩模式: {mode}")
+        self.mode = mode
+        self.max_workers = max(1, int((os.cpu_count() or 1) * cpu_fraction))
+        self.on_replaced = on_replaced
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._pool = None
+        self._thread = None
+
+    @staticmethod
+    def available():
+        return Image is not None
+
+    def start(self):
+        """启动后台线程；上次未处理完的文件会继续处理"""
+        self._thread = threading.Thread(target=self._run, name="compressor", daemon=True)
+        self._thread.start()
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, paths):
+        """把新归档的文件加入队列（立即返回）"""
+        rows = [(os.fspath(p), 'pending') for p in paths
+                if os.path.splitext(os.fspath(p))[1].lower() in SOURCE_EXTENSIONS]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO jobs (path, status) VALUES (?, ?)", rows
+            )
+            self._conn.commit()
+        self._wakeup.set()
+
+    def stats(self):
+        """{状态: (文件数, 原字节数, 新字节数)}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*), SUM(bytes_before), SUM(bytes_after) FROM jobs GROUP BY status"
+            ).fetchall()
+        return {status: (count, before or 0, after or 0) for status, count, before, after in rows}
+
+    def _pending_chunk(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT path FROM jobs WHERE status = 'pending' LIMIT ?", (CHUNK_SIZE,)
+            )]
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while not self._stopped.is_set():
+                paths = self._pending_chunk()
+                if not paths:
+                    break
+                self._process(paths)
+
+    def _process(self, paths):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_lower_priority)
+        futures = {path: self._pool.submit(_recompress, path, self.mode) for path in paths}
+
+        updates = []
+        replaced = []
+        for path, future in futures.items():
+            try:
+                status, new_path, before, after = future.result()
+            except FileNotFoundError:
+                status, new_path, before, after = 'missing', path, None, None
+            except Exception as e:
+                if self._stopped.is_set():
+                    return
+                print(f"重新编码失败 {path}: {e}")
+                status, new_path, before, after = 'failed', path, None, None
+            COMPRESS_FILES.inc(result=status)
+            if status == 'done':
+                COMPRESS_SAVED_BYTES.inc(before - after)
+                replaced.append((path, new_path))
+            updates.append((status, before, after, path))
+
+        # 每批提交一次，中断时最多重做一批
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET status = ?, bytes_before = ?, bytes_after = ? WHERE path = ?",
+                updates,
+            )
+            self._conn.commit()
+        if replaced and self.on_replaced is not None:
+            self.on_replaced(replaced)
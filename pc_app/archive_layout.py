@@ -0,0 +1,116 @@
+"""
+Archive Layout
+"已到期" 文件夹的布局：平铺，或按创建月份分片为 "已到期/YYYY-MM"。
+
+单个文件夹中的文件达到数十万时，列举、重名检查以及资源管理器 / OneDrive 同步都会明显变慢；
+分片后每个子文件夹只包含一个月的截图，计数按分片分别缓存（见 scanner.scan_screenshots）。
+
+一次性迁移（把已有的平铺归档按月份移动到分片中）:
+    python archive_layout.py --reshard
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from file_mover import MoveEngine
+from scanner import ARCHIVE_FOLDER_NAME, is_expired_folder, shard_name
+
+# 分片模式（.env 中 ARCHIVE_SHARDING）：month 按月份分片，其他值为平铺
+SHARDING_MONTH = "month"
+
+
+def sharding_enabled(value=None):
+    """读取分片配置；value 为 None 时使用环境变量 ARCHIVE_SHARDING"""
+    if value is None:
+        value = os.getenv('ARCHIVE_SHARDING', '')
+    return value.strip().lower() == SHARDING_MONTH
+
+
+def archive_target(root, created_at, sharded, folder=ARCHIVE_FOLDER_NAME):
+    """到期文件应移动到的文件夹；folder 为到期规则指定的归档文件夹名"""
+    archive = Path(root) / folder
+    return archive / shard_name(created_at) if sharded else archive
+
+
+def group_by_target(root, items, sharded, folder_of=None):
+    """把 [(路径, 创建时间戳), ...] 按目标文件夹分组，返回 {目标文件夹: [路径, ...]}
+
+    folder_of: 回调 folder_of(路径) -> 归档文件夹名，为 None 时全部归档到 "已到期"
+    """
+    groups = {}
+    for path, created_at in items:
+        folder = folder_of(path) if folder_of is not None else ARCHIVE_FOLDER_NAME
+        groups.setdefault(archive_target(root, created_at, sharded, folder), []).append(path)
+    return groups
+
+
+def archived_created_at(st):
+    """归档文件的创建时间戳，用于分片
+
+    Windows 上为 st_ctime（创建时间，重新编码后由 archive_compressor 还原）；
+    其他系统上 st_ctime 是元数据变更时间，移动和重新编码都会改变它，改用保留下来的修改时间
+    """
+    return st.st_ctime if os.name == 'nt' else st.st_mtime
+
+
+def reshard_archive(root, engine, progress=None):
+    """把各到期归档文件夹中直接存放的文件按创建月份移动到分片文件夹，返回 MoveReport
+
+    每个归档文件夹只列举一次，所有文件分组后交给移动引擎批量处理（同一卷内只是 rename）。
+    """
+    groups = {}
+    with os.scandir(root) as folders:
+        for folder in folders:
+            if not folder.is_dir() or not is_expired_folder(folder.name):
+                continue
+            items = []
+            with os.scandir(folder.path) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        items.append((entry.path, archived_created_at(entry.stat())))
+            for target, paths in group_by_target(root, items, True, lambda _: folder.name).items():
+                groups.setdefault(target, []).extend(paths)
+    return engine.move_grouped(groups, progress)
+
+
+def main():
+    load_dotenv(Path(__file__).parent / '.env')
+
+    parser = argparse.ArgumentParser(description="\"已到期\" 文件夹分片工具")
+    parser.add_argument('--reshard', action='store_true', help="把平铺的归档按月份移动到分片文件夹")
+    parser.add_argument('--path', default=None,
+                        help="截图根目录，多个目录用 os.pathsep 分隔（默认取 .env 中的 SCREENSHOTS_PATHS / SCREENSHOTS_PATH）")
+    parser.add_argument('--workers', type=int, default=int(os.getenv('MOVE_WORKERS', '4')),
+                        help="移动线程数")
+    args = parser.parse_args()
+
+    if not args.reshard:
+        parser.print_help()
+        return
+
+    # organizer_engine 导入了本模块，只在命令行中延迟导入
+    from organizer_engine import screenshot_roots
+
+    engine = MoveEngine(max_workers=args.workers)
+    try:
+        for root in screenshot_roots(args.path).values():
+            if not root.is_dir():
+                print(f"截图目录不存在: {root}")
+                continue
+            print(f"截图目录: {root}")
+            report = reshard_archive(
+                root, engine,
+                progress=lambda done, total: print(f"\r已处理 {done}/{total}", end="", flush=True),
+            )
+            print(f"\n分片完成: 移动 {report.total_moved} 个文件, 失败 {len(report.failed)} 个")
+            for src, error in report.failed:
+                print(f"  移动失败 {Path(src).name}: {error}")
+    finally:
+        engine.shutdown()
+
+
+if __name__ == '__main__':
+    main()
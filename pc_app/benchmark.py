@@ -0,0 +1,263 @@
+"""
+Benchmark
+扫描 / 整理 / 状态查询热点路径的基准测试（无需 PyQt）。
+
+在临时目录中生成不同规模的 Screenshots 目录树（根目录中一半已到期、一半未到期的图片，
+以及 "已到期" 和大量 "HH-HH" 文件夹中的归档文件），对各函数计时，结果以 JSON 输出，
+便于不同版本之间比较。
+
+用法:
+    python benchmark.py                                # 1k / 10k / 100k 三种规模
+    python benchmark.py --sizes 1000,10000 --output bench.json
+    python benchmark.py --baseline bench.json          # 与上次结果对比
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from ctime_cache import CtimeCache
+from file_mover import MoveEngine
+from folder_index import FolderIndex, MultiRootIndex
+from scanner import ARCHIVE_FOLDER_NAME, has_archive_folders, scan_screenshots
+
+# 目录树构成：归档文件占 80%，根目录图片占 20%（其中一半已到期）
+ARCHIVE_FRACTION = 0.8
+TIME_FOLDER_COUNT = 24
+
+
+def build_tree(root, size):
+    """生成合成目录树，返回 expire_before 时间戳
+
+    创建时间（ctime）无法随意设置，因此先创建"已到期"的那一半根目录图片，
+    记下时间点后再创建另一半，以该时间点作为到期分界。
+    """
+    archived = int(size * ARCHIVE_FRACTION)
+    loose = size - archived
+
+    folders = [root / ARCHIVE_FOLDER_NAME] + [
+        root / f"{h:02d}-{h + 1:02d}" for h in range(TIME_FOLDER_COUNT)
+    ]
+    for folder in folders:
+        folder.mkdir(parents=True, exist_ok=True)
+    for i in range(archived):
+        (folders[i % len(folders)] / f"archived_{i:07d}.png").write_bytes(b"x")
+
+    for i in range(loose // 2):
+        (root / f"old_{i:07d}.png").write_bytes(b"x")
+    time.sleep(0.05)
+    expire_before = time.time()
+    time.sleep(0.05)
+    for i in range(loose - loose // 2):
+        (root / f"new_{i:07d}.png").write_bytes(b"x")
+    # 非图片文件：应被忽略
+    for i in range(max(1, loose // 100)):
+        (root / f"note_{i:05d}.txt").write_bytes(b"x")
+    return expire_before
+
+
+def timed(func, repeat):
+    """执行 func repeat 次，返回每次耗时（秒）"""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return runs
+
+
+def summarize(name, size, runs, **extra):
+    entry = {
+        "name": name,
+        "size": size,
+        "best_s": round(min(runs), 6),
+        "mean_s": round(statistics.mean(runs), 6),
+        "runs": [round(r, 6) for r in runs],
+    }
+    entry.update(extra)
+    return entry
+
+
+def bench_status_endpoint(root, size, clients, requests_per_client):
+    """用 Flask 测试客户端并发请求 /api/status；未安装 Flask 时返回 None"""
+    os.environ['SCREENSHOTS_PATH'] = str(root)
+    try:
+        import web_server
+    except ImportError as e:
+        print(f"跳过 /api/status 基准（{e}）", file=sys.stderr)
+        return None
+
+    # 模块只导入一次，切换目录树时按服务器的方式重建索引（含文件监听和对账线程）
+    web_server.folder_index.stop()
+    web_server.roots = {root.name: root}
+    web_server.folder_index = MultiRootIndex(web_server.roots)
+    web_server.folder_index.start()
+
+    def client_loop(_):
+        client = web_server.app.test_client()
+        latencies = []
+        errors = 0
+        for _ in range(requests_per_client):
+            started = time.perf_counter()
+            resp = client.get('/api/status')
+            if resp.status_code != 200:
+                # 错误响应不计入吞吐和延迟
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+        return latencies, errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        chunks = list(pool.map(client_loop, range(clients)))
+    elapsed = time.perf_counter() - started
+    web_server.folder_index.stop()
+    latencies = sorted(lat for chunk, _ in chunks for lat in chunk)
+    errors = sum(errors for _, errors in chunks)
+    if errors:
+        print(f"[{size}] /api/status 有 {errors} 个错误响应", file=sys.stderr)
+    return summarize(
+        "api_status_concurrent", size, [elapsed],
+        clients=clients,
+        requests=len(latencies),
+        errors=errors,
+        passed=errors == 0,
+        rps=round(len(latencies) / elapsed, 1),
+        p50_ms=round(latencies[len(latencies) // 2] * 1000, 3) if latencies else None,
+        p99_ms=round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3)
+        if latencies else None,
+    )
+
+
+def run_size(size, repeat, clients, requests_per_client, work_dir):
+    root = Path(work_dir) / f"Screenshots_{size}"
+    build_started = time.perf_counter()
+    expire_before = build_tree(root, size)
+    print(f"[{size}] 目录树生成 {time.perf_counter() - build_started:.2f}s", file=sys.stderr)
+
+    results = []
+
+    # 整理扫描：一次遍历得到到期图片和文件夹计数
+    scan = scan_screenshots(root, expire_before=expire_before)
+    results.append(summarize(
+        "scan_organize", size,
+        timed(lambda: scan_screenshots(root, expire_before=expire_before), repeat),
+        expired=len(scan.expired_files), fresh=len(scan.fresh_files), archived=scan.total_count,
+    ))
+
+    # 带创建时间缓存的整理扫描（首次填充缓存，之后命中）
+    cache = CtimeCache(Path(work_dir) / f"cache_{size}.db")
+    results.append(summarize(
+        "scan_organize_ctime_cache_cold", size,
+        timed(lambda: scan_screenshots(root, expire_before=expire_before, ctime_cache=cache), 1),
+    ))
+    results.append(summarize(
+        "scan_organize_ctime_cache_warm", size,
+        timed(lambda: scan_screenshots(root, expire_before=expire_before, ctime_cache=cache), repeat),
+    ))
+    cache.close()
+
+    # 只统计归档文件夹的扫描（托盘刷新状态时的扫描）
+    results.append(summarize(
+        "count_total_items", size,
+        timed(lambda: scan_screenshots(root, collect_images=False).total_count, repeat),
+    ))
+    cached = {
+        name: (scan.folder_mtimes[name], count) for name, count in scan.folder_counts.items()
+    }
+    results.append(summarize(
+        "count_total_items_cached_folders", size,
+        timed(lambda: scan_screenshots(root, collect_images=False, cached_folders=cached), repeat),
+    ))
+
+    # 是否存在归档文件夹（找到一个即返回）
+    results.append(summarize(
+        "check_for_existing_time_folders", size,
+        timed(lambda: has_archive_folders(root), repeat),
+    ))
+
+    # check_has_folders 的数据来源：索引全量构建与对账
+    index = FolderIndex(root)
+    results.append(summarize("folder_index_build", size, timed(index.reconcile, 1)))
+    results.append(summarize("folder_index_reconcile", size, timed(index.reconcile, repeat)))
+    results.append(summarize("check_has_folders", size, timed(index.snapshot, repeat)))
+
+    status = bench_status_endpoint(root, size, clients, requests_per_client)
+    if status is not None:
+        results.append(status)
+
+    # 最后执行移动（会改变目录树）
+    engine = MoveEngine()
+    sources = [path for path, _ in scan.expired_files]
+    runs = timed(lambda: engine.move_files(sources, root / ARCHIVE_FOLDER_NAME), 1)
+    engine.shutdown()
+    results.append(summarize("move_expired", size, runs, files=len(sources)))
+
+    shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def attach_baseline(results, baseline_path):
+    """为每项结果附加与基线相比的耗时比例（>1 表示变慢）"""
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    previous = {(r["name"], r["size"]): r for r in baseline.get("results", [])}
+    for result in results:
+        old = previous.get((result["name"], result["size"]))
+        if old and old["best_s"] > 0:
+            result["baseline_ratio"] = round(result["best_s"] / old["best_s"], 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="扫描 / 整理 / 状态查询基准测试")
+    parser.add_argument('--sizes', default='1000,10000,100000', help="目录树规模（文件数），逗号分隔")
+    parser.add_argument('--repeat', type=int, default=3, help="每项重复次数")
+    parser.add_argument('--clients', type=int, default=16, help="/api/status 并发客户端数")
+    parser.add_argument('--requests', type=int, default=200, help="每个客户端的请求数")
+    parser.add_argument('--output', help="结果写入该 JSON 文件（默认输出到标准输出）")
+    parser.add_argument('--baseline', help="与之前的结果 JSON 对比")
+    parser.add_argument('--work-dir', help="生成目录树的位置（默认系统临时目录）")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    work_dir = tempfile.mkdtemp(prefix="screenshot_bench_", dir=args.work_dir)
+    try:
+        results = []
+        for size in sizes:
+            results.extend(run_size(size, args.repeat, args.clients, args.requests, work_dir))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.baseline:
+        attach_baseline(results, args.baseline)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+    # 有错误响应时以非零状态码退出，错误不会被当成吞吐
+    if any(result.get("passed") is False for result in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
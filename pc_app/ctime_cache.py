@@ -0,0 +1,111 @@
+"""
+Creation Time Cache
+截图创建时间的持久化缓存（SQLite，保存在程序目录下）。
+
+文件的创建时间不会改变，缓存后再次扫描时无需逐个 stat：
+- Windows: 目录列举已带文件大小，按 文件名 + 大小 校验
+- 其他系统: 目录项自带 inode，按 文件名 + inode 校验
+只缓存创建时间；到期时刻取决于按文件名匹配的规则，由 ExpiryScheduler 在内存中计算。
+"""
+
+import os
+import sqlite3
+import threading
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    file_id INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (folder, name)
+);
+"""
+
+
+class CtimeCache:
+    """文件创建时间缓存
+
+    db_path: SQLite 文件路径
+    读写都经过内存字典，只有新文件和消失的文件才写数据库。
+    """
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(files)")]
+        if "expires_at" in columns:
+            # 旧版本按默认保留时长预先计算的到期时刻，缓存可以重建，直接删除旧表
+            self._conn.executescript(
+                "DROP INDEX IF EXISTS idx_files_expires; DROP TABLE files;"
+            )
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+        # (folder, name) -> (size, file_id, created_at)
+        self._known = {}
+        for folder, name, size, file_id, created_at in self._conn.execute(
+            "SELECT folder, name, size, file_id, created_at FROM files"
+        ):
+            self._known[(folder, name)] = (size, file_id, created_at)
+        self._pending = []
+        # 缓存未命中时产生的 stat 调用数（供扫描统计开销）
+        self.stat_calls = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def created_at(self, folder, entry):
+        """返回 DirEntry 的创建时间戳；缓存命中时不产生 stat 调用"""
+        key = (folder, entry.name)
+        cached = self._known.get(key)
+        if cached is not None:
+            size, file_id, created_at = cached
+            if os.name == 'nt':
+                # Windows 下 DirEntry.stat() 来自目录列举，不产生额外调用
+                if entry.stat().st_size == size:
+                    return created_at
+            elif entry.inode() == file_id:
+                return created_at
+
+        st = entry.stat()
+        self.stat_calls += 1
+        file_id = 0 if os.name == 'nt' else entry.inode()
+        self._known[key] = (st.st_size, file_id, st.st_ctime)
+        self._pending.append((folder, entry.name, st.st_size, file_id, st.st_ctime))
+        return st.st_ctime
+
+    def retain(self, folder, names):
+        """只保留 folder 下仍存在的文件，其余记录删除"""
+        gone = [name for (f, name) in self._known if f == folder and name not in names]
+        for name in gone:
+            del self._known[(folder, name)]
+        if gone:
+            with self._lock:
+                self._conn.executemany(
+                    "DELETE FROM files WHERE folder = ? AND name = ?",
+                    [(folder, name) for name in gone],
+                )
+                self._conn.commit()
+
+    def flush(self):
+        """批量写入新登记的文件"""
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def entries(self, folder):
+        """返回 [(路径, 创建时间戳), ...]，按创建时间排序"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, created_at FROM files WHERE folder = ? ORDER BY created_at",
+                (folder,),
+            ).fetchall()
+        return [(os.path.join(folder, name), created_at) for name, created_at in rows]
@@ -0,0 +1,403 @@
+"""
+Duplicate Detection
+重复 / 近似重复截图检测。
+
+- 完全相同：先按文件大小筛选，只有大小相同的文件才计算内容哈希
+- 近似相同：感知哈希（dHash，NumPy 向量化计算），汉明距离不超过阈值即视为近似重复
+- 哈希结果保存在 SQLite 索引中（与 servers.json 同目录），近似查找使用 BK 树，
+  每次查询只访问距离可能满足条件的分支，10 万张图片也无需两两比较
+
+需要 Pillow 和 NumPy，未安装时 available() 返回 False。
+
+为已有归档建立索引 / 查看重复:
+    python dedup.py --index
+    python dedup.py --report
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from scanner import is_archive_folder, is_expired_folder, is_image_name, is_shard_name
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # 未安装时不启用去重
+    np = None
+    Image = None
+
+# dHash 边长：8 x 8 = 64 位
+HASH_SIZE = 8
+# 汉明距离不超过该值视为近似重复
+NEAR_DUPLICATE_DISTANCE = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT,
+    phash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_images_size ON images (size);
+"""
+
+
+def available():
+    return np is not None and Image is not None
+
+
+def dhash(path, hash_size=HASH_SIZE):
+    """差值哈希：缩小为 (hash_size + 1) x hash_size 的灰度图，比较相邻像素的明暗"""
+    with Image.open(path) as image:
+        small = image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def content_hash(path, chunk_size=1024 * 1024):
+    """文件内容哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """按汉明距离组织的 BK 树；每个节点保存同一哈希值的所有路径，删除只从集合中移除"""
+
+    def __init__(self):
+        # 节点: [哈希值, 路径集合, {距离: 子节点}]
+        self._root = None
+
+    def add(self, value, key):
+        if self._root is None:
+            self._root = [value, {key}, {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].add(key)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, {key}, {}]
+                return
+            node = child
+
+    def discard(self, value, key):
+        node = self._root
+        while node is not None:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].discard(key)
+                return
+            node = node[2].get(distance)
+
+    def search(self, value, max_distance):
+        """返回 [(距离, 路径), ...]，只访问 |d - 距离| <= max_distance 的子树"""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                found.extend((distance, key) for key in node[1])
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class DuplicateIndex:
+    """持久化的图片哈希索引
+
+    db_path: SQLite 文件路径
+    threshold: 近似重复的汉明距离阈值
+    """
+
+    def __init__(self, db_path, threshold=NEAR_DUPLICATE_DISTANCE):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+        self._tree = BKTree()
+        # 路径 -> 感知哈希
+        self._phashes = {}
+        for path, phash in self._conn.execute("SELECT path, phash FROM images"):
+            value = int(phash, 16)
+            self._phashes[path] = value
+            self._tree.add(value, path)
+
+        # duplicate_groups() 的缓存：本连接写入时清空，其他连接写入后 data_version 变化
+        self._groups_version = None
+        self._groups = None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def check(self, path):
+        """登记一个文件，返回 (完全相同的已知文件路径或 None, [(距离, 近似重复的路径), ...])
+
+        哈希计算（解码、读文件）都不持有锁；大小相同的已知文件会重新 stat，
+        登记后被修改或替换过的文件重新计算哈希，不会按过期的哈希判定为完全相同
+        """
+        path = os.fspath(path)
+        st = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, content_hash, phash FROM images WHERE path = ?", (path,)
+            ).fetchone()
+            # 大小预筛：只有存在同样大小的文件时才计算内容哈希
+            same_size = self._conn.execute(
+                "SELECT path, mtime_ns, content_hash FROM images WHERE size = ? AND path != ?",
+                (st.st_size, path),
+            ).fetchall()
+        if row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            own_hash, phash = row[2], int(row[3], 16)
+        else:
+            own_hash, phash = None, dhash(path)
+
+        exact = None
+        # 需要写回索引的其他文件: [(路径, 大小, mtime_ns, 内容哈希, 感知哈希或 None), ...]
+        updates = []
+        for other, other_mtime, other_hash in same_size:
+            try:
+                other_st = os.stat(other)
+            except OSError:
+                continue
+            changed = other_st.st_size != st.st_size or other_st.st_mtime_ns != other_mtime
+            if changed:
+                # 登记后被修改或替换：重新计算两种哈希
+                try:
+                    other_hash = content_hash(other)
+                    other_phash = dhash(other)
+                except Exception:
+                    continue
+                updates.append((other, other_st.st_size, other_st.st_mtime_ns, other_hash, other_phash))
+                if other_st.st_size != st.st_size:
+                    continue
+            elif other_hash is None:
+                other_hash = content_hash(other)
+                updates.append((other, other_st.st_size, other_st.st_mtime_ns, other_hash, None))
+            if own_hash is None:
+                own_hash = content_hash(path)
+            if other_hash == own_hash:
+                exact = other
+                break
+
+        with self._lock:
+            for other, size, mtime_ns, digest, other_phash in updates:
+                if other_phash is None:
+                    self._conn.execute(
+                        "UPDATE images SET content_hash = ? WHERE path = ?", (digest, other)
+                    )
+                    continue
+                self._conn.execute(
+                    "UPDATE images SET size = ?, mtime_ns = ?, content_hash = ?, phash = ? WHERE path = ?",
+                    (size, mtime_ns, digest, f"{other_phash:016x}", other),
+                )
+                self._replace_phash(other, other_phash)
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?)",
+                (path, st.st_size, st.st_mtime_ns, own_hash, f"{phash:016x}"),
+            )
+            self._conn.commit()
+            self._groups = None
+            self._replace_phash(path, phash)
+
+            near = [
+                (distance, other) for distance, other in self._tree.search(phash, self.threshold)
+                if other != path and other != exact
+            ]
+        return exact, sorted(near)
+
+    def _replace_phash(self, path, phash):
+        """更新内存中的感知哈希（调用方持有锁）"""
+        old = self._phashes.get(path)
+        if old is not None:
+            self._tree.discard(old, path)
+        self._phashes[path] = phash
+        self._tree.add(phash, path)
+
+    def relocate(self, moves):
+        """文件移动后更新路径：moves 为 [(源路径, 目标路径), ...]"""
+        with self._lock:
+            for src, dest in moves:
+                phash = self._phashes.pop(src, None)
+                if phash is None:
+                    continue
+                self._tree.discard(phash, src)
+                self._phashes[dest] = phash
+                self._tree.add(phash, dest)
+            self._conn.executemany(
+                "UPDATE OR REPLACE images SET path = ? WHERE path = ?",
+                [(dest, src) for src, dest in moves],
+            )
+            self._conn.commit()
+            self._groups = None
+
+    def reencoded(self, replaced):
+        """归档压缩无损重新编码后更新记录：replaced 为 [(原路径, 新路径), ...]（扩展名不变时两者相同）
+
+        像素不变，感知哈希沿用；文件大小和字节内容已变化，更新大小并清空内容哈希（下次比较时重新计算），
+        否则按大小预筛时会漏掉与新文件完全相同的截图
+        """
+        renamed = [(src, dest) for src, dest in replaced if src != dest]
+        if renamed:
+            self.relocate(renamed)
+        rows = []
+        for _, dest in replaced:
+            try:
+                st = os.stat(dest)
+            except FileNotFoundError:
+                continue
+            rows.append((st.st_size, st.st_mtime_ns, dest))
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE images SET size = ?, mtime_ns = ?, content_hash = NULL WHERE path = ?", rows
+            )
+            self._conn.commit()
+            self._groups = None
+
+    def remove(self, paths):
+        """删除已不存在的文件的记录"""
+        with self._lock:
+            for path in paths:
+                phash = self._phashes.pop(path, None)
+                if phash is not None:
+                    self._tree.discard(phash, path)
+            self._conn.executemany("DELETE FROM images WHERE path = ?", [(p,) for p in paths])
+            self._conn.commit()
+            self._groups = None
+
+    def duplicate_groups(self):
+        """所有重复组：{"exact": [[路径, ...], ...], "near": [[路径, ...], ...]}（near 包括完全相同的文件）
+
+        直接从数据库读取（其他进程写入的记录也包括在内），数据库未变化时返回缓存结果
+        """
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._groups is not None and version == self._groups_version:
+                return self._groups
+            rows = self._conn.execute("SELECT path, content_hash, phash FROM images").fetchall()
+
+        by_content = {}
+        tree = BKTree()
+        phashes = {}
+        for path, digest, phash in rows:
+            if digest is not None:
+                by_content.setdefault(digest, []).append(path)
+            value = int(phash, 16)
+            phashes[path] = value
+            tree.add(value, path)
+        exact = [sorted(paths) for paths in by_content.values() if len(paths) > 1]
+
+        # 并查集：距离不超过阈值的图片归为一组
+        parent = {path: path for path in phashes}
+
+        def find(x):
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for path, value in phashes.items():
+            for _, other in tree.search(value, self.threshold):
+                root_a, root_b = find(path), find(other)
+                if root_a != root_b:
+                    parent[root_a] = root_b
+        clusters = {}
+        for path in parent:
+            clusters.setdefault(find(path), []).append(path)
+        near = [sorted(paths) for paths in clusters.values() if len(paths) > 1]
+
+        groups = {"exact": sorted(exact), "near": sorted(near)}
+        with self._lock:
+            self._groups_version = version
+            self._groups = groups
+        return groups
+
+
+def check_batch(index, paths):
+    """对一批待归档的文件查重，返回 {路径: (完全相同的文件或 None, [(距离, 近似重复的路径), ...])}
+
+    无法解码的文件跳过（不出现在结果中）
+    """
+    found = {}
+    for path in paths:
+        try:
+            exact, near = index.check(path)
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            print(f"计算图片哈希失败 {path}: {e}")
+            continue
+        if exact is not None or near:
+            found[path] = (exact, near)
+    return found
+
+
+def main():
+    load_dotenv(Path(__file__).parent / '.env')
+
+    parser = argparse.ArgumentParser(description="重复截图检测")
+    parser.add_argument('--index', action='store_true', help="为所有归档文件夹中的图片建立哈希索引")
+    parser.add_argument('--report', action='store_true', help="列出重复和近似重复的图片")
+    parser.add_argument('--path', default=os.getenv('SCREENSHOTS_PATH', '~/OneDrive/图片/Screenshots'),
+                        help="截图根目录")
+    args = parser.parse_args()
+
+    if not available():
+        print("需要安装 Pillow 和 numpy")
+        return
+
+    index = DuplicateIndex(Path(__file__).parent / "dedup_index.db")
+    try:
+        if args.index:
+            root = Path(args.path).expanduser()
+            folders = [p for p in root.iterdir() if p.is_dir() and is_archive_folder(p.name)]
+            # 到期归档文件夹中的月份分片
+            folders += [
+                shard for folder in folders if is_expired_folder(folder.name)
+                for shard in folder.iterdir() if shard.is_dir() and is_shard_name(shard.name)
+            ]
+            indexed = 0
+            for folder in folders:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if entry.is_file() and is_image_name(entry.name):
+                            index.check(entry.path)
+                            indexed += 1
+            print(f"已索引 {indexed} 个文件")
+        if args.report:
+            groups = index.duplicate_groups()
+            print(f"完全相同: {len(groups['exact'])} 组")
+            for paths in groups['exact']:
+                print("  " + " = ".join(paths))
+            print(f"近似重复: {len(groups['near'])} 组")
+            for paths in groups['near']:
+                print("  " + " ~ ".join(paths))
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
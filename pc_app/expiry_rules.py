@@ -0,0 +1,288 @@
+"""
+Expiry Rules
+按文件名规则决定截图的保留时长和归档文件夹，代替固定的 "3 天、所有图片、已到期"。
+
+规则从 JSON 文件读取（默认 expiry_rules.json，可用 .env 中的 EXPIRY_RULES 指定路径），
+按顺序匹配，第一条匹配的规则生效；最后总是附加一条默认规则:
+
+    {
+        "default_retention_days": 3,
+        "rules": [
+            {"name": "排除", "pattern": "^keep_", "exclude": true},
+            {"name": "游戏", "pattern": "steam|game", "retention_days": 1, "target": "已到期-游戏"},
+            {"name": "工作", "pattern": "work", "extensions": [".png"], "retention_days": 7}
+        ]
+    }
+
+- pattern: 对文件名的正则（不区分大小写，匹配文件名任意位置），省略时匹配所有文件名
+- extensions: 扩展名列表，省略时为所有图片扩展名
+- target: 归档文件夹名，必须是 "已到期" 或 "已到期-<名称>"
+- exclude: 为 true 时匹配的文件永不归档
+
+所有规则预先编译并按扩展名分桶。只由字面量组成的 pattern（如 "steam|game"、"^keep_"、"_draft$"）
+放入字典树，每个文件名只遍历一次，开销只与文件名长度有关，与这类规则的数量无关；
+其他正则各自单独编译，按优先级逐条匹配（只尝试优先级高于已命中规则的），开销随这类规则的数量线性增加。
+"""
+
+import json
+import os
+import re
+from pathlib import Path
+
+from scanner import ARCHIVE_FOLDER_NAME, IMAGE_EXTENSIONS, is_expired_folder
+
+DEFAULT_RETENTION_DAYS = 3
+RULES_FILE_NAME = "expiry_rules.json"
+
+
+class ExpiryRule:
+    """一条到期规则；retention_seconds 为 None 表示排除"""
+
+    def __init__(self, name, pattern=None, extensions=None, retention_days=DEFAULT_RETENTION_DAYS,
+                 target=ARCHIVE_FOLDER_NAME, exclude=False):
+        self.name = name
+        self.pattern = pattern
+        self.extensions = (
+            {ext.lower() if ext.startswith('.') else f".{ext.lower()}" for ext in extensions}
+            if extensions else set(IMAGE_EXTENSIONS)
+        )
+        self.retention_seconds = None if exclude else float(retention_days) * 24 * 3600
+        self.target = target
+        if not exclude and not is_expired_folder(target):
+            raise ValueError(f"规则 {name} 的归档文件夹必须是 '{ARCHIVE_FOLDER_NAME}' 或 '{ARCHIVE_FOLDER_NAME}-<名称>': {target}")
+        if pattern is not None:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"规则 {name} 的正则无效: {e}") from e
+
+    @property
+    def excluded(self):
+        return self.retention_seconds is None
+
+
+# 字面量中不能出现的正则元字符（转义后可以）
+_REGEX_META = set('.^$*+?{}[]()|\\')
+
+
+def _literal_alternatives(pattern):
+    """pattern 只由字面量和 | 组成（每个分支可带 ^ / $ 锚点）时返回
+    [(小写字面量, 锚定开头, 锚定结尾), ...]，否则返回 None"""
+    alternatives = []
+    current = []
+    anchored_start = anchored_end = False
+    i = 0
+    while i <= len(pattern):
+        c = pattern[i] if i < len(pattern) else '|'
+        if c == '|':
+            if not current:
+                # 空分支匹配所有文件名，交给正则处理
+                return None
+            alternatives.append((''.join(current).lower(), anchored_start, anchored_end))
+            current = []
+            anchored_start = anchored_end = False
+        elif anchored_end:
+            # $ 之后还有字符
+            return None
+        elif c == '\\':
+            escaped = pattern[i + 1:i + 2]
+            # \d、\b、\1 等是字符类、断言或反向引用，不是字面量
+            if not escaped or (escaped.isascii() and escaped.isalnum()):
+                return None
+            current.append(escaped)
+            i += 1
+        elif c == '^' and not current and not anchored_start:
+            anchored_start = True
+        elif c == '$':
+            anchored_end = True
+        elif c in _REGEX_META:
+            return None
+        else:
+            current.append(c)
+        i += 1
+    return alternatives
+
+
+def _trie_add(trie, text, index):
+    node = trie
+    for c in text:
+        node = node.setdefault(c, {})
+    # 规则按优先级依次加入，同一字面量保留最先加入的规则
+    node.setdefault(None, index)
+
+
+def _trie_walk(trie, text, start, best):
+    """从 text[start] 开始沿字典树匹配，返回匹配到的最小规则序号（不小于 best 时返回 best）"""
+    node = trie
+    for i in range(start, len(text)):
+        node = node.get(text[i])
+        if node is None:
+            break
+        index = node.get(None)
+        if index is not None and index < best:
+            best = index
+    return best
+
+
+class _BucketMatcher:
+    """一个扩展名桶的规则匹配器
+
+    rules: [(规则序号, 规则), ...]，按优先级排列
+    字面量规则分别放入 完整匹配字典 / 开头 / 结尾 / 任意位置 四个字典树，
+    其余正则逐条匹配；结果为命中的最小规则序号。
+    """
+
+    def __init__(self, rules):
+        self.no_match = rules[-1][0] + 1
+        self.catch_all = self.no_match
+        self.exact = {}
+        self.prefix = {}
+        self.suffix = {}
+        self.anywhere = {}
+        self.regexes = []
+        for index, rule in rules:
+            if rule.pattern is None:
+                # 无 pattern 的规则匹配所有文件名，其后的规则不会再被匹配
+                self.catch_all = index
+                break
+            literals = _literal_alternatives(rule.pattern)
+            if literals is None:
+                # 每条正则单独编译，分组编号和反向引用与单独使用时相同
+                self.regexes.append((index, re.compile(rule.pattern, re.IGNORECASE | re.DOTALL)))
+                continue
+            for text, anchored_start, anchored_end in literals:
+                if anchored_start and anchored_end:
+                    self.exact.setdefault(text, index)
+                elif anchored_start:
+                    _trie_add(self.prefix, text, index)
+                elif anchored_end:
+                    _trie_add(self.suffix, text[::-1], index)
+                else:
+                    _trie_add(self.anywhere, text, index)
+
+    def match(self, name):
+        """命中的规则序号，没有命中时返回 None"""
+        lowered = name.lower()
+        best = min(self.catch_all, self.exact.get(lowered, self.no_match))
+        if self.prefix:
+            best = _trie_walk(self.prefix, lowered, 0, best)
+        if self.suffix:
+            best = _trie_walk(self.suffix, lowered[::-1], 0, best)
+        if self.anywhere:
+            anywhere = self.anywhere
+            for start, c in enumerate(lowered):
+                # 大多数位置的字符不是任何字面量的开头，不进入字典树
+                if c in anywhere:
+                    best = _trie_walk(anywhere, lowered, start, best)
+        for index, regex in self.regexes:
+            if index >= best:
+                break
+            if regex.search(name):
+                best = index
+                break
+        return best if best != self.no_match else None
+
+
+class ExpiryPolicy:
+    """编译后的规则集
+
+    每个扩展名对应一个 _BucketMatcher，只包含适用于该扩展名的规则。
+    """
+
+    def __init__(self, rules, default_retention_days=DEFAULT_RETENTION_DAYS):
+        self.default_rule = ExpiryRule("默认", retention_days=default_retention_days)
+        self.rules = list(rules) + [self.default_rule]
+        self.extensions = frozenset().union(*(rule.extensions for rule in self.rules))
+        self._buckets = {
+            ext: _BucketMatcher([
+                (index, rule) for index, rule in enumerate(self.rules) if ext in rule.extensions
+            ])
+            for ext in self.extensions
+        }
+
+    def match(self, name):
+        """文件名匹配的规则，没有规则适用时返回 None"""
+        bucket = self._buckets.get(os.path.splitext(name)[1].lower())
+        if bucket is None:
+            return None
+        index = bucket.match(name)
+        return self.rules[index] if index is not None else None
+
+    def is_candidate(self, name):
+        """扫描时的预筛：扩展名属于任一规则"""
+        return os.path.splitext(name)[1].lower() in self.extensions
+
+    def retention_for(self, name):
+        """文件的保留秒数，排除或不适用时返回 None"""
+        rule = self.match(name)
+        return rule.retention_seconds if rule is not None else None
+
+    def target_for(self, path):
+        """文件的归档文件夹名"""
+        rule = self.match(os.path.basename(path))
+        return rule.target if rule is not None else ARCHIVE_FOLDER_NAME
+
+    def split(self, items, now):
+        """一次遍历把 [(路径, 创建时间戳), ...] 分为 (已到期, 未到期)，排除和不适用的文件丢弃"""
+        expired = []
+        fresh = []
+        for path, created_at in items:
+            rule = self.match(os.path.basename(path))
+            if rule is None or rule.excluded:
+                continue
+            if created_at + rule.retention_seconds <= now:
+                expired.append((path, created_at))
+            else:
+                fresh.append((path, created_at))
+        return expired, fresh
+
+    def describe(self):
+        """每条规则一行的说明"""
+        lines = []
+        for rule in self.rules:
+            condition = f"/{rule.pattern}/" if rule.pattern is not None else "所有文件"
+            if rule.excluded:
+                lines.append(f"{rule.name}: {condition} 不归档")
+            else:
+                days = rule.retention_seconds / 86400
+                lines.append(f"{rule.name}: {condition} 保留 {days:g} 天 -> {rule.target}")
+        return lines
+
+
+def rules_path(project_dir):
+    """规则文件路径（.env 中的 EXPIRY_RULES，默认程序目录下的 expiry_rules.json）"""
+    return Path(os.getenv('EXPIRY_RULES', Path(project_dir) / RULES_FILE_NAME))
+
+
+def disabled_policy():
+    """规则无效时使用的规则集：所有文件都不归档（不能退回默认规则，否则原本排除的文件会被移走）"""
+    return ExpiryPolicy([ExpiryRule("规则无效", exclude=True)])
+
+
+def load_policy(project_dir):
+    """读取规则文件；文件不存在时只有默认规则（保留天数取 .env 中的 RETENTION_DAYS）
+
+    规则无效时抛出 ValueError
+    """
+    default_days = float(os.getenv('RETENTION_DAYS', DEFAULT_RETENTION_DAYS))
+    path = rules_path(project_dir)
+    if not path.exists():
+        return ExpiryPolicy([], default_days)
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"读取规则文件失败 {path}: {e}") from e
+
+    rules = []
+    for i, item in enumerate(config.get('rules', [])):
+        rules.append(ExpiryRule(
+            name=item.get('name', f"规则{i + 1}"),
+            pattern=item.get('pattern'),
+            extensions=item.get('extensions'),
+            retention_days=item.get('retention_days', default_days),
+            target=item.get('target', ARCHIVE_FOLDER_NAME),
+            exclude=item.get('exclude', False),
+        ))
+    return ExpiryPolicy(rules, config.get('default_retention_days', default_days))
@@ -0,0 +1,91 @@
+"""
+Expiry Scheduler
+按到期时间排序的最小堆：记录每个截图文件的到期时刻，
+整理程序只需等待到最早的到期时刻，再取出已到期的文件处理。
+"""
+
+import heapq
+import time
+
+
+class ExpiryScheduler:
+    """截图到期时刻的最小堆
+
+    堆中元素为 (到期时间戳, 路径字符串)。删除采用惰性方式：
+    只从 _known 中移除，堆顶遇到失效元素时再丢弃。
+    retention_seconds 为默认保留时长，add() 可按文件单独指定。
+    """
+
+    def __init__(self, retention_seconds=3 * 24 * 3600):
+        self.retention_seconds = retention_seconds
+        self._heap = []
+        self._known = {}  # 路径 -> 到期时间戳
+        self._created = {}  # 路径 -> 创建时间戳
+
+    def __len__(self):
+        return len(self._known)
+
+    def __contains__(self, path):
+        return str(path) in self._known
+
+    def add(self, path, created_at, retention_seconds=None):
+        """登记文件，created_at 为创建时间戳；返回到期时间戳"""
+        key = str(path)
+        if retention_seconds is None:
+            retention_seconds = self.retention_seconds
+        expires_at = created_at + retention_seconds
+        if self._known.get(key) == expires_at:
+            return expires_at
+        self._known[key] = expires_at
+        self._created[key] = created_at
+        heapq.heappush(self._heap, (expires_at, key))
+        return expires_at
+
+    def discard(self, path):
+        """移除文件（文件已被删除或移走）"""
+        self._known.pop(str(path), None)
+        self._created.pop(str(path), None)
+
+    def known_paths(self):
+        """返回当前登记的所有路径"""
+        return set(self._known)
+
+    def clear(self):
+        self._heap.clear()
+        self._known.clear()
+        self._created.clear()
+
+    def _drop_stale(self):
+        while self._heap:
+            expires_at, key = self._heap[0]
+            if self._known.get(key) == expires_at:
+                return
+            heapq.heappop(self._heap)
+
+    def next_expiry(self):
+        """最早的到期时间戳，没有文件时返回 None"""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def seconds_until_next(self, now=None):
+        """距离最早到期还有多少秒（已到期返回 0），没有文件时返回 None"""
+        next_expiry = self.next_expiry()
+        if next_expiry is None:
+            return None
+        if now is None:
+            now = time.time()
+        return max(0.0, next_expiry - now)
+
+    def pop_due(self, now=None):
+        """取出所有已到期的文件，返回 [(路径字符串, 创建时间戳), ...]"""
+        if now is None:
+            now = time.time()
+        due = []
+        while True:
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                break
+            expires_at, key = heapq.heappop(self._heap)
+            del self._known[key]
+            due.append((key, self._created.pop(key)))
+        return due
@@ -0,0 +1,79 @@
+"""
+File Listing
+归档文件夹的文件列表与字节数统计，供 /api/folders 和 /api/files 使用。
+
+分页按文件名排序，游标是上一页最后一个文件名的不透明编码；
+每一页都从 os.scandir 生成器中筛选，只保留 limit 个候选，内存占用与文件夹大小无关。
+"""
+
+import base64
+import binascii
+import heapq
+import os
+import threading
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(name):
+    """把文件名编码为不透明游标"""
+    return base64.urlsafe_b64encode(name.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解码游标，无效时抛出 ValueError"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        return base64.b64decode(padded.encode('ascii'), altchars=b'-_', validate=True).decode('utf-8')
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError(f"无效的游标: {cursor}") from e
+
+
+def iter_files(folder):
+    """逐个产生文件夹中的文件 DirEntry（不包括子文件夹）"""
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file():
+                yield entry
+
+
+def list_page(folder, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """返回一页文件: ([{name, size, mtime}, ...], 下一页游标或 None)
+
+    只保留文件名大于游标的前 limit + 1 个条目（多取一个用于判断是否还有下一页）
+    """
+    after = decode_cursor(cursor) if cursor else None
+    candidates = (entry for entry in iter_files(folder) if after is None or entry.name > after)
+    page = heapq.nsmallest(limit + 1, candidates, key=lambda entry: entry.name)
+
+    has_more = len(page) > limit
+    page = page[:limit]
+    files = []
+    for entry in page:
+        # Windows 下 DirEntry.stat() 直接使用目录列举时返回的信息
+        st = entry.stat()
+        files.append({"name": entry.name, "size": st.st_size, "mtime": int(st.st_mtime)})
+    next_cursor = encode_cursor(page[-1].name) if has_more else None
+    return files, next_cursor
+
+
+class FolderSizeCache:
+    """各文件夹的字节数，按文件夹 mtime 缓存：文件夹内容未变化时不再逐个统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 路径 -> (st_mtime_ns, 字节数)
+        self._sizes = {}
+
+    def size(self, folder):
+        folder = os.fspath(folder)
+        mtime = os.stat(folder).st_mtime_ns
+        with self._lock:
+            cached = self._sizes.get(folder)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        total = sum(entry.stat().st_size for entry in iter_files(folder))
+        with self._lock:
+            self._sizes[folder] = (mtime, total)
+        return total
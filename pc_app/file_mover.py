@@ -0,0 +1,213 @@
+"""
+File Mover
+批量移动到期截图：同一卷内直接 rename，跨卷才复制（先复制为临时文件，完成后再改名）；
+分批在有界线程池中执行，并按确定的规则处理重名文件。
+提供 MoveJournal 时每批移动前后写日志，进程中断后可用 replay() 继续未完成的移动。
+"""
+
+import errno
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import MOVE_DURATION, MOVE_FILES, MOVE_JOB_DURATION
+from move_journal import PARTIAL_SUFFIX
+
+
+def same_volume(path_a, path_b):
+    """两个已存在的路径是否位于同一文件系统（同一卷）"""
+    return os.stat(path_a).st_dev == os.stat(path_b).st_dev
+
+
+def unique_name(name, taken, target_folder):
+    """为 name 在目标文件夹中找一个不冲突的名字
+
+    冲突时依次尝试 "名字 (1).png"、"名字 (2).png"……
+    taken: 本批次已占用的名字集合（会被更新）
+    """
+    stem, suffix = os.path.splitext(name)
+    candidate = name
+    n = 0
+    while candidate in taken or os.path.exists(os.path.join(target_folder, candidate)):
+        n += 1
+        candidate = f"{stem} ({n}){suffix}"
+    taken.add(candidate)
+    return candidate
+
+
+class MoveReport:
+    """一次批量移动的结果
+
+    moved: [(源路径, 目标路径), ...]
+    failed: [(源路径, 错误信息), ...]
+    missing: [源路径, ...] 移动前已被删除或移走的文件
+    collapsed: [(源路径, 保留的相同文件路径), ...] 去重时删除而未移动的文件
+    near_duplicates: [(源路径, [(距离, 近似重复的路径), ...]), ...] 只报告、未处理
+    """
+
+    def __init__(self, target_folder):
+        self.target_folder = target_folder
+        self.moved = []
+        self.failed = []
+        self.missing = []
+        self.collapsed = []
+        self.near_duplicates = []
+
+    @property
+    def total_moved(self):
+        return len(self.moved)
+
+
+class MoveEngine:
+    """批量移动引擎
+
+    max_workers: 线程池大小（同时进行的批次数）
+    batch_size: 每批文件数，每完成一批回调一次进度、写一次日志
+    journal: MoveJournal，为 None 时不记录日志
+    """
+
+    def __init__(self, max_workers=4, batch_size=200, journal=None):
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.journal = journal
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mover")
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+    def plan(self, sources, target_folder):
+        """确定每个文件的目标路径：按文件名排序后依次分配，重名结果可复现"""
+        taken = set()
+        plan = []
+        for src in sorted(sources, key=lambda p: (os.path.basename(p), p)):
+            name = unique_name(os.path.basename(src), taken, target_folder)
+            plan.append((src, os.path.join(target_folder, name)))
+        return plan
+
+    def move_files(self, sources, target_folder, progress=None):
+        """移动一批文件到 target_folder，阻塞直到全部完成，返回 MoveReport
+
+        progress: 回调 progress(已完成数, 总数)，在工作线程中调用
+        """
+        return self.move_grouped({target_folder: sources}, progress)
+
+    def move_grouped(self, groups, progress=None):
+        """按目标文件夹分组移动：{目标文件夹: [源路径, ...]}，所有分组共用线程池和进度
+
+        返回一份 MoveReport，target_folder 为各目标文件夹的共同上级
+        """
+        groups = {
+            os.fspath(folder): [os.fspath(src) for src in sources]
+            for folder, sources in groups.items() if sources
+        }
+        if not groups:
+            return MoveReport(None)
+        folders = list(groups)
+        report = MoveReport(folders[0] if len(folders) == 1 else os.path.commonpath(folders))
+
+        plan = []
+        for target_folder, sources in groups.items():
+            os.makedirs(target_folder, exist_ok=True)
+            plan.extend(self.plan(sources, target_folder))
+        self._run_plan(plan, report, progress)
+        return report
+
+    def replay(self, progress=None):
+        """继续移动日志中上次中断时未完成的文件，返回 MoveReport
+
+        moved 包括检查日志时确认已经完成的移动；原目标名已被占用的文件重新分配名字
+        """
+        if self.journal is None:
+            return MoveReport(None)
+        redo, completed = self.journal.recover()
+        folders = {os.path.dirname(dest) for _, dest in redo + completed}
+        if not folders:
+            return MoveReport(None)
+        report = MoveReport(os.path.commonpath(list(folders)))
+        report.moved.extend(completed)
+
+        taken = {}
+        plan = []
+        for src, dest in redo:
+            folder = os.path.dirname(dest)
+            os.makedirs(folder, exist_ok=True)
+            names = taken.setdefault(folder, set())
+            if os.path.exists(dest) or os.path.basename(dest) in names:
+                dest = os.path.join(folder, unique_name(os.path.basename(src), names, folder))
+            else:
+                names.add(os.path.basename(dest))
+            plan.append((src, dest))
+        self._run_plan(plan, report, progress)
+        return report
+
+    def _run_plan(self, plan, report, progress):
+        """分批执行 [(源路径, 目标路径), ...]，结果写入 report"""
+        total = len(plan)
+
+        lock = threading.Lock()
+        done = [0]
+        volume_cache = {}
+
+        def run_batch(batch):
+            moved = []
+            failed = []
+            missing = []
+            if self.journal is not None:
+                self.journal.begin(batch)
+            for src, dest in batch:
+                started = time.perf_counter()
+                try:
+                    self._move_one(src, dest, os.path.dirname(dest), volume_cache)
+                    moved.append((src, dest))
+                    MOVE_DURATION.observe(time.perf_counter() - started)
+                except FileNotFoundError:
+                    missing.append(src)
+                except Exception as e:
+                    failed.append((src, str(e)))
+            if self.journal is not None:
+                self.journal.finish([src for src, _ in batch])
+            with lock:
+                report.moved.extend(moved)
+                report.failed.extend(failed)
+                report.missing.extend(missing)
+                MOVE_FILES.inc(len(moved), result="moved")
+                MOVE_FILES.inc(len(failed), result="failed")
+                MOVE_FILES.inc(len(missing), result="missing")
+                done[0] += len(batch)
+                finished = done[0]
+            if progress is not None:
+                progress(finished, total)
+
+        batches = [plan[i:i + self.batch_size] for i in range(0, total, self.batch_size)]
+        with MOVE_JOB_DURATION.time():
+            futures = [self._pool.submit(run_batch, batch) for batch in batches]
+            for future in futures:
+                future.result()
+
+    def _move_one(self, src, dest, target_folder, volume_cache):
+        src_dir = os.path.dirname(src)
+        fast = volume_cache.get((src_dir, target_folder))
+        if fast is None:
+            fast = same_volume(src_dir, target_folder)
+            volume_cache[(src_dir, target_folder)] = fast
+
+        if fast:
+            try:
+                # 同一卷：只修改目录项，不复制数据
+                os.rename(src, dest)
+                return
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+        # 跨卷：先复制为临时文件，中断时不会留下看起来完整的半个目标文件
+        partial = dest + PARTIAL_SUFFIX
+        try:
+            shutil.copy2(src, partial)
+            os.replace(partial, dest)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        os.remove(src)
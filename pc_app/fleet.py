@@ -0,0 +1,157 @@
+"""
+Fleet Aggregator
+汇总 servers.json 中所有服务器的状态，客户端一次请求 /api/fleet 即可拿到全部机器的状态，
+不必每个客户端各自轮询每台机器。
+
+- 各服务器并行查询（有界线程池），复用 StatusPoller 的 keep-alive 连接和条件请求
+- 结果缓存 cache_ttl 秒，缓存有效期内的请求不访问其他机器
+- 整个响应最多等待 timeout 秒：未及时返回的服务器使用上次的结果（标记 stale），
+  查询继续在后台完成，一台慢机器不会拖慢整个响应
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+from status_poller import StatusPoller
+
+
+class PeerStatus:
+    """一台服务器最近一次查询的结果"""
+
+    def __init__(self, hostname, ip, port):
+        self.hostname = hostname
+        self.ip = ip
+        self.port = str(port)
+        self.online = False
+        self.has_folders = False
+        self.count = 0
+        self.message = "尚未查询"
+        self.etag = None
+        # 上次查询完成的时刻（time.monotonic），None 表示从未完成
+        self.checked_at = None
+        self.updated = None
+        self.future = None
+
+    def to_dict(self):
+        return {
+            "hostname": self.hostname,
+            "ip": self.ip,
+            "port": self.port,
+            "online": self.online,
+            "status": ("has" if self.has_folders else "none") if self.online else "offline",
+            "totalCount": self.count,
+            "message": self.message,
+            "updated": self.updated,
+            # 查询未及时完成，返回的是上次的结果
+            "stale": self.checked_at is None or self.future is not None,
+        }
+
+
+class FleetAggregator:
+    """servers.json 中所有服务器的状态汇总
+
+    servers_file: 与托盘程序 AppManager 共用的 servers.json
+    cache_ttl: 结果缓存秒数
+    timeout: 单台服务器的连接 / 读取超时，也是整个响应的最长等待时间（秒）
+    """
+
+    def __init__(self, servers_file, cache_ttl=15, timeout=2, max_workers=8):
+        self.servers_file = Path(servers_file)
+        self.cache_ttl = cache_ttl
+        self.timeout = timeout
+        self._poller = StatusPoller(max_workers=1, timeout=timeout)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fleet")
+        self._lock = threading.Lock()
+        # (ip, port) -> PeerStatus，按 servers.json 的顺序
+        self._peers = {}
+        self._servers_mtime = None
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+        self._poller.shutdown()
+
+    def _load_servers(self):
+        """servers.json 修改后重新读取；已知服务器保留缓存的结果"""
+        try:
+            mtime = self.servers_file.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._servers_mtime:
+            return
+        try:
+            servers = json.loads(self.servers_file.read_text(encoding="utf-8")) if mtime else []
+        except (OSError, ValueError):
+            # 托盘程序正在写入时可能读到不完整的文件，下次请求再读
+            return
+        self._servers_mtime = mtime
+
+        peers = {}
+        for s in servers:
+            key = (s["ip"], str(s["port"]))
+            peer = self._peers.get(key) or PeerStatus(s["hostname"], s["ip"], s["port"])
+            peer.hostname = s["hostname"]
+            peers[key] = peer
+        self._peers = peers
+
+    def status(self):
+        """所有服务器的状态：返回 [服务器字典, ...]（按 servers.json 的顺序）"""
+        now = time.monotonic()
+        with self._lock:
+            self._load_servers()
+            peers = list(self._peers.values())
+            pending = []
+            for peer in peers:
+                fresh = peer.checked_at is not None and now - peer.checked_at <= self.cache_ttl
+                if not fresh and peer.future is None:
+                    peer.future = self._pool.submit(self._refresh, peer)
+                if peer.future is not None:
+                    pending.append(peer.future)
+
+        if pending:
+            # 慢的服务器在后台继续查询，本次先用上次的结果
+            wait(pending, timeout=self.timeout)
+
+        with self._lock:
+            return [peer.to_dict() for peer in peers]
+
+    def _refresh(self, peer):
+        """查询一台服务器（运行在线程池中）"""
+        headers = {"If-None-Match": peer.etag} if peer.etag else {}
+        try:
+            status, resp_headers, body = self._poller.request(
+                peer.ip, peer.port, "/api/status?fields=status,totalCount,message", headers
+            )
+            if status == 200:
+                data = json.loads(body.decode("utf-8"))
+                result = (
+                    data.get("status") == "has",
+                    int(data.get("totalCount", 0)),
+                    data.get("message", ""),
+                    resp_headers.get("ETag"),
+                )
+            elif status != 304:
+                raise RuntimeError(f"HTTP {status}")
+            else:
+                result = None
+            error = None
+        except Exception as e:
+            result = None
+            error = str(e)
+
+        with self._lock:
+            peer.future = None
+            peer.checked_at = time.monotonic()
+            if error is not None:
+                peer.online = False
+                peer.etag = None
+                peer.message = f"连接失败 ({error})"
+                return
+            if result is not None:
+                peer.has_folders, peer.count, peer.message, peer.etag = result
+            # 304：状态未变化，只刷新查询时间
+            peer.online = True
+            peer.updated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
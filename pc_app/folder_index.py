@@ -0,0 +1,347 @@
+"""
+Folder Count Index
+归档文件夹的内存计数索引：启动时统计一次，之后由文件系统事件增量更新，
+并定期对账以弥补遗漏的事件，使 /api/status 可直接从内存读取结果。
+计数变化时唤醒等待中的长轮询请求。
+
+FolderIndex 维护一个截图目录的计数；MultiRootIndex 管理一个或多个目录的 FolderIndex：
+共用一个文件监听和一个对账线程，不同磁盘上的目录并行统计，同一磁盘上的目录依次统计。
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # 未安装 watchdog 时只依赖定期对账
+    Observer = None
+    FileSystemEventHandler = object
+
+from scanner import archive_folder_key, count_archive_folder, scan_screenshots
+
+logger = logging.getLogger(__name__)
+
+
+def status_etag(has_folders, total_count):
+    """由计数状态派生的 ETag：文件夹存在情况和文件总数不变时不变"""
+    return f"{int(has_folders)}-{total_count}"
+
+
+class _IndexEventHandler(FileSystemEventHandler):
+    """把 watchdog 事件转交给 FolderIndex"""
+
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+
+    def on_created(self, event):
+        self.index.on_path_added(event.src_path, event.is_directory)
+
+    def on_deleted(self, event):
+        self.index.on_path_removed(event.src_path, event.is_directory)
+
+    def on_moved(self, event):
+        self.index.on_path_removed(event.src_path, event.is_directory)
+        self.index.on_path_added(event.dest_path, event.is_directory)
+
+
+class FolderIndex:
+    """归档文件夹文件数的增量索引
+
+    counts: 文件夹名 -> 文件数（分片 "已到期/YYYY-MM" 单独计数，总数为各项之和）
+    对账时只重新统计 mtime 发生变化的文件夹，未变化的文件夹不会被遍历。
+    文件监听和定期对账由 MultiRootIndex 负责，本类只提供 reconcile() 和事件回调。
+    condition: 多个索引共用的 Condition（由 MultiRootIndex 传入），为 None 时单独创建
+    recount_delay: 新建的文件夹在事件平息多少秒后重新统计
+    """
+
+    def __init__(self, root, condition=None, recount_delay=1.0):
+        self.root = Path(root)
+        self.recount_delay = recount_delay
+
+        # 计数变化时 notify_all，唤醒 wait_for_change 中的长轮询
+        self._changed = condition if condition is not None else threading.Condition()
+        self._lock = self._changed
+        self._counts = {}
+        self._mtimes = {}
+        self._total = 0
+        # 等待重新统计的文件夹: 计数键 -> 事件序号（统计期间又有事件时序号变化，需要再统计一次）
+        self._dirty = {}
+        self._recount_timer = None
+        # 对账扫描期间收到事件的计数键（不在对账时为 None）
+        self._touched = None
+
+    def close(self):
+        """取消等待中的重新统计"""
+        with self._lock:
+            if self._recount_timer is not None:
+                self._recount_timer.cancel()
+                self._recount_timer = None
+
+    def snapshot(self):
+        """返回 (has_folders, total_count)，O(1)"""
+        with self._lock:
+            return bool(self._counts), self._total
+
+    def folder_counts(self):
+        """返回各文件夹文件数的副本"""
+        with self._lock:
+            return dict(self._counts)
+
+    def reconcile(self):
+        """与磁盘对账：只重新统计 mtime 有变化的文件夹
+
+        扫描在锁外进行；扫描期间收到事件的文件夹无法确定扫描结果是否已包含该事件，
+        保留事件更新后的计数，并标记为待重新统计
+        """
+        with self._lock:
+            cached = {
+                name: (mtime, self._counts[name])
+                for name, mtime in self._mtimes.items() if name in self._counts
+            }
+            self._touched = set()
+        try:
+            result = scan_screenshots(self.root, collect_images=False, cached_folders=cached)
+        except OSError as e:
+            logger.error("对账文件夹计数时出错: %s", e)
+            with self._lock:
+                self._touched = None
+            return
+
+        with self._lock:
+            touched, self._touched = self._touched, None
+            counts = result.folder_counts
+            mtimes = result.folder_mtimes
+            for key in touched:
+                mtimes.pop(key, None)
+                if key in self._counts:
+                    counts[key] = self._counts[key]
+                else:
+                    counts.pop(key, None)
+            self._counts = counts
+            self._mtimes = mtimes
+            self._total = sum(counts.values())
+            self._changed.notify_all()
+            for key in touched:
+                self._mark_dirty(key)
+
+    def _touch(self, key):
+        """记录扫描期间收到事件的计数键（调用方持有锁）"""
+        if self._touched is not None:
+            self._touched.add(key)
+
+    def _relative_parts(self, path):
+        try:
+            return Path(path).relative_to(self.root).parts
+        except ValueError:
+            return ()
+
+    def on_path_added(self, path, is_directory):
+        """事件回调：新增文件或文件夹（分片 "已到期/YYYY-MM" 按独立文件夹计数）"""
+        key, rest = archive_folder_key(self._relative_parts(path))
+        if key is None:
+            return
+        if not rest and is_directory:
+            self._mark_dirty(key)
+        elif len(rest) == 1 and not is_directory:
+            with self._lock:
+                if key in self._counts and key not in self._dirty:
+                    self._counts[key] += 1
+                    self._total += 1
+                    self._touch(key)
+                    self._changed.notify_all()
+                    return
+            # 新建的文件夹，或文件夹的创建事件晚于其中文件的事件
+            self._mark_dirty(key)
+
+    def on_path_removed(self, path, is_directory):
+        """事件回调：删除文件或文件夹（删除事件不一定能区分文件和文件夹）"""
+        key, rest = archive_folder_key(self._relative_parts(path))
+        if key is None:
+            return
+        with self._lock:
+            if not rest and key in self._counts:
+                # 删除 "已到期" 时其下的分片一并移除
+                prefix = key + "/"
+                for name in [k for k in self._counts if k == key or k.startswith(prefix)]:
+                    self._total -= self._counts.pop(name)
+                    self._mtimes.pop(name, None)
+                    self._touch(name)
+                self._changed.notify_all()
+            elif key in self._dirty:
+                # 等待重新统计，统计结果已包含这次删除
+                return
+            elif len(rest) == 1 and not is_directory and self._counts.get(key, 0) > 0:
+                self._counts[key] -= 1
+                self._total -= 1
+                self._touch(key)
+                self._changed.notify_all()
+
+    def _mark_dirty(self, key):
+        """新建的文件夹不逐个累加其中文件的事件（创建时统计到的文件随后还会各有一个事件，
+        会被重复计数），而是在事件平息 recount_delay 秒后统一重新统计一次"""
+        with self._lock:
+            self._dirty[key] = self._dirty.get(key, 0) + 1
+            if self._recount_timer is not None:
+                self._recount_timer.cancel()
+            self._recount_timer = threading.Timer(self.recount_delay, self._recount_dirty)
+            self._recount_timer.daemon = True
+            self._recount_timer.start()
+
+    def _recount_dirty(self):
+        with self._lock:
+            self._recount_timer = None
+            pending = dict(self._dirty)
+        for key, seq in pending.items():
+            self._recount_folder(key, seq)
+
+    def _recount_folder(self, key, seq):
+        try:
+            counts = count_archive_folder(self.root, key)
+        except OSError:
+            # 文件夹已被删除
+            counts = None
+        with self._lock:
+            if self._dirty.get(key) != seq:
+                # 统计期间又有新事件，计时器已重新启动，届时再统计
+                return
+            del self._dirty[key]
+            if counts is None:
+                return
+            for name, count in counts.items():
+                self._total += count - self._counts.get(name, 0)
+                self._counts[name] = count
+                # 不记录 mtime，下次对账时会再核对一次
+                self._mtimes.pop(name, None)
+                self._touch(name)
+            # 对账时只有父文件夹 mtime 变化才会重新列举分片，这里让它必定重新列举
+            self._mtimes.pop(key.split("/")[0], None)
+            self._changed.notify_all()
+
+
+def _device_of(path):
+    """目录所在的设备（磁盘）；目录不存在时按盘符区分"""
+    try:
+        return os.stat(path).st_dev
+    except OSError:
+        return Path(path).anchor
+
+
+class MultiRootIndex:
+    """多个截图目录的计数索引
+
+    roots: {名称: 目录}；每个目录一个 FolderIndex，共用同一个 Condition，
+    任一目录的计数变化都会唤醒长轮询。snapshot() 返回所有目录的合计。
+    """
+
+    def __init__(self, roots, reconcile_interval=300):
+        self.reconcile_interval = reconcile_interval
+        self._changed = threading.Condition()
+        self.indexes = {
+            name: FolderIndex(root, condition=self._changed)
+            for name, root in roots.items()
+        }
+
+        self._observer = None
+        self._stop_event = threading.Event()
+        self._reconcile_thread = None
+
+    @property
+    def default_root(self):
+        """第一个目录的名称（请求未指定目录时使用）"""
+        return next(iter(self.indexes))
+
+    def start(self):
+        """全量统计一次，然后启动共用的文件监听和定期对账线程"""
+        self.reconcile()
+
+        if Observer is not None:
+            try:
+                self._observer = Observer()
+                for index in self.indexes.values():
+                    if index.root.exists():
+                        self._observer.schedule(_IndexEventHandler(index), str(index.root), recursive=True)
+                self._observer.daemon = True
+                self._observer.start()
+            except Exception as e:
+                logger.warning("启动文件监听失败，仅使用定期对账: %s", e)
+                self._observer = None
+
+        self._reconcile_thread = threading.Thread(target=self._reconcile_loop, daemon=True)
+        self._reconcile_thread.start()
+
+    def stop(self):
+        """停止监听和对账线程"""
+        self._stop_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        for index in self.indexes.values():
+            index.close()
+
+    def reconcile(self):
+        """对账所有目录：按磁盘分组，不同磁盘并行，同一磁盘依次统计（避免磁头来回寻道）"""
+        groups = {}
+        for index in self.indexes.values():
+            groups.setdefault(_device_of(index.root), []).append(index)
+        if len(groups) == 1:
+            self._reconcile_group(next(iter(groups.values())))
+            return
+        with ThreadPoolExecutor(max_workers=len(groups), thread_name_prefix="reconcile") as pool:
+            list(pool.map(self._reconcile_group, groups.values()))
+
+    @staticmethod
+    def _reconcile_group(indexes):
+        for index in indexes:
+            index.reconcile()
+
+    def _reconcile_loop(self):
+        while not self._stop_event.wait(self.reconcile_interval):
+            self.reconcile()
+
+    def _status_locked(self):
+        # Condition 默认使用可重入锁，持有时可以调用各索引的 snapshot()
+        roots = {name: index.snapshot() for name, index in self.indexes.items()}
+        has_folders = any(has for has, _ in roots.values())
+        total = sum(count for _, count in roots.values())
+        etag = status_etag(has_folders, total)
+        if len(roots) > 1:
+            # 文件在目录之间移动时合计不变，ETag 仍需变化
+            etag += "-" + ".".join(str(count) for _, count in roots.values())
+        return has_folders, total, roots, etag
+
+    def snapshot(self):
+        """返回所有目录合计的 (has_folders, total_count)"""
+        with self._changed:
+            return self._status_locked()[:2]
+
+    def status(self):
+        """返回 (has_folders, total_count, {名称: (has_folders, total_count)}, etag)"""
+        with self._changed:
+            return self._status_locked()
+
+    def etag(self):
+        """当前计数状态对应的 ETag（单个目录时只由文件夹存在情况和文件总数决定）"""
+        return self.status()[3]
+
+    def wait_for_change(self, etag, timeout):
+        """阻塞直到 ETag 不再等于 etag 或超时，返回与 status() 相同的元组"""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            status = self._status_locked()
+            while status[3] == etag:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+                status = self._status_locked()
+            return status
+
+    def folder_counts(self, root=None):
+        """指定目录（默认第一个）中各文件夹的文件数；目录不存在时抛出 KeyError"""
+        return self.indexes[root or self.default_root].folder_counts()
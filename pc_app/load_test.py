@@ -0,0 +1,110 @@
+"""
+Load Test
+对运行中的 Web 服务器做并发压测，验证吞吐目标。
+
+每个并发客户端使用一条 keep-alive 连接循环请求，结束后输出
+请求数、吞吐量和延迟分位数（JSON），未达到目标时以非零状态码退出。
+
+用法:
+    python web_server.py                  # 另开一个窗口启动服务器
+    python load_test.py --clients 50 --duration 10 --target-rps 500 --target-p99-ms 50
+"""
+
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def run_client(host, port, path, deadline, latencies, errors, lock):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    local_latencies = []
+    local_errors = 0
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            resp = conn.getresponse()
+            resp.read()
+            if resp.status >= 400:
+                local_errors += 1
+                continue
+            if resp.will_close:
+                conn.close()
+        except Exception:
+            local_errors += 1
+            conn.close()
+            continue
+        local_latencies.append(time.perf_counter() - started)
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors[0] += local_errors
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Web 服务器并发压测")
+    parser.add_argument('--url', default='http://127.0.0.1:5001/api/status', help="压测地址")
+    parser.add_argument('--clients', type=int, default=50, help="并发客户端数")
+    parser.add_argument('--duration', type=float, default=10.0, help="压测时长（秒）")
+    parser.add_argument('--target-rps', type=float, default=500.0, help="吞吐目标（请求/秒）")
+    parser.add_argument('--target-p99-ms', type=float, default=50.0, help="p99 延迟目标（毫秒）")
+    args = parser.parse_args()
+
+    parts = urlsplit(args.url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(parts.hostname, parts.port or 80, path, deadline, latencies, errors, lock),
+        )
+        for _ in range(args.clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    rps = len(latencies) / elapsed if elapsed > 0 else 0.0
+    p99_ms = percentile(latencies, 0.99) * 1000
+    passed = rps >= args.target_rps and p99_ms <= args.target_p99_ms and errors[0] == 0
+    result = {
+        "url": args.url,
+        "clients": args.clients,
+        "duration_s": round(elapsed, 3),
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": round(rps, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+        "p99_ms": round(p99_ms, 2),
+        "target_rps": args.target_rps,
+        "target_p99_ms": args.target_p99_ms,
+        "passed": passed,
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Logging Utilities
+Web 服务器的日志配置：按 .env 中的 LOG_LEVEL 分级输出，
+同一条日志在短时间内大量重复时限流，避免控制台输出拖慢请求处理。
+"""
+
+import logging
+import logging.handlers
+import os
+import threading
+import time
+
+
+class RateLimitFilter(logging.Filter):
+    """同一日志模板在 interval 秒内最多输出 burst 条，其余丢弃
+
+    按 (logger 名, 级别, 消息模板) 分组，因此日志调用应使用 % 参数而不是 f-string。
+    ERROR 及以上级别不限流。下一个周期的第一条日志的 suppressed 属性为上个周期丢弃的条数
+    （不修改日志内容，由 RateLimitFormatter 输出）。每个 handler 使用各自的实例。
+    """
+
+    def __init__(self, interval=10.0, burst=5):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._windows = {}  # key -> [周期开始时间, 已输出条数, 已丢弃条数]
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True
+
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            # 同一条日志会依次经过每个 handler，每次都重新设置
+            record.suppressed = 0
+            if window is None or now - window[0] >= self.interval:
+                record.suppressed = window[2] if window is not None else 0
+                window = [now, 0, 0]
+                self._windows[key] = window
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class RateLimitFormatter(logging.Formatter):
+    """在日志末尾附带 RateLimitFilter 记录的上个周期丢弃条数"""
+
+    def format(self, record):
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            text += f"（上个周期另有 {suppressed} 条相同日志被省略）"
+        return text
+
+
+def setup_logging():
+    """根据环境变量配置根 logger
+
+    LOG_LEVEL: DEBUG / INFO / WARNING / ERROR，默认 INFO
+    LOG_FILE: 若设置，同时写入该文件（按 5MB 轮转，保留 3 个）
+    LOG_RATE_INTERVAL / LOG_RATE_BURST: 限流周期（秒）和每周期条数
+    """
+    level = getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+    rate_interval = float(os.getenv('LOG_RATE_INTERVAL', '10'))
+    rate_burst = int(os.getenv('LOG_RATE_BURST', '5'))
+    formatter = RateLimitFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    handlers = [logging.StreamHandler()]
+    log_file = os.getenv('LOG_FILE')
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=5 * 1024 * 1024, backupCount=3, encoding='utf-8'
+        ))
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        # 子 logger 的日志传到根 logger 时不经过根 logger 的 filter，因此加在 handler 上
+        handler.addFilter(RateLimitFilter(interval=rate_interval, burst=rate_burst))
+        root.addHandler(handler)
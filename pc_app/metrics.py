@@ -0,0 +1,250 @@
+"""
+Metrics
+进程内的计时与计数指标，可按 Prometheus 文本格式导出（Web 服务器的 /metrics），
+也可生成可读的摘要（托盘的"运行统计"）。
+
+热点路径的指标集中定义在本模块底部，扫描、移动和 Web 请求各自记录。
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时直方图的默认分桶（秒）
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# 数量直方图的默认分桶（文件数 / 调用次数）
+COUNT_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + inner + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._render_samples())
+        return lines
+
+
+class Counter(_Metric):
+    """单调递增计数"""
+
+    type_name = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(v)}"
+                for key, v in items]
+
+    def summary(self):
+        with self._lock:
+            return sum(self._values.values())
+
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+
+    type_name = "gauge"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _render_samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(v)}"
+                for key, v in items]
+
+
+class Histogram(_Metric):
+    """分桶直方图：记录观测值的分布、总数和总和"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # key -> [各桶计数..., +Inf 计数], 总和, 总数
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """计时上下文：with HISTOGRAM.time(): ..."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_samples(self):
+        with self._lock:
+            items = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def summary(self):
+        """(总次数, 平均值, 估计的 p95 上界)"""
+        with self._lock:
+            counts = [0] * (len(self.buckets) + 1)
+            total = 0.0
+            count = 0
+            for series in self._series.values():
+                counts = [a + b for a, b in zip(counts, series[0])]
+                total += series[1]
+                count += series[2]
+        if count == 0:
+            return 0, 0.0, 0.0
+        threshold = count * 0.95
+        cumulative = 0
+        p95 = float("inf")
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            if cumulative >= threshold:
+                p95 = bound
+                break
+        return count, total / count, p95
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        """Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self):
+        """可读摘要，每个指标一行"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            if isinstance(metric, Histogram):
+                count, mean, p95 = metric.summary()
+                if count:
+                    lines.append(f"{metric.help_text}: {count} 次, 平均 {mean:.4g}, p95 ≤ {p95:g}")
+            elif isinstance(metric, Counter):
+                lines.append(f"{metric.help_text}: {metric.summary():g}")
+        return lines
+
+
+REGISTRY = Registry()
+
+# 扫描（托盘整理和 Web 索引对账共用 scan_screenshots）
+SCAN_DURATION = REGISTRY.histogram(
+    "screenshot_scan_duration_seconds", "扫描耗时（秒）")
+SCAN_ENTRIES = REGISTRY.histogram(
+    "screenshot_scan_entries_visited", "每次扫描访问的目录项数", buckets=COUNT_BUCKETS)
+SCAN_STAT_CALLS = REGISTRY.histogram(
+    "screenshot_scan_stat_calls", "每次扫描的 stat 调用数", buckets=COUNT_BUCKETS)
+
+# 托盘后台扫描任务（status / rescan / organize）
+SCAN_JOBS = REGISTRY.counter(
+    "screenshot_scan_jobs_total", "托盘后台扫描任务数", labels=("kind",))
+
+# 移动
+MOVE_DURATION = REGISTRY.histogram(
+    "screenshot_move_duration_seconds", "单个文件移动耗时（秒）")
+MOVE_JOB_DURATION = REGISTRY.histogram(
+    "screenshot_move_job_duration_seconds", "整批移动耗时（秒）")
+MOVE_FILES = REGISTRY.counter(
+    "screenshot_moved_files_total", "移动处理的文件数", labels=("result",))
+
+# 归档重新编码
+COMPRESS_FILES = REGISTRY.counter(
+    "screenshot_compressed_files_total", "重新编码处理的文件数", labels=("result",))
+COMPRESS_SAVED_BYTES = REGISTRY.counter(
+    "screenshot_compressed_saved_bytes_total", "重新编码节省的字节数")
+
+# 归档文件总数（/metrics 被抓取时从索引读取）
+INDEX_TOTAL_FILES = REGISTRY.gauge(
+    "screenshot_archived_files", "归档文件夹中的文件总数")
+
+# Web 请求
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时（秒，长轮询以 mode=wait 单独统计）",
+    labels=("endpoint", "method", "status", "mode"))
@@ -0,0 +1,110 @@
+"""
+Move Journal
+批量移动的预写日志（SQLite，保存在程序目录下）。
+
+每批文件移动前先写入 "intent" 记录并提交，整批完成后再标记为 "done" 并提交，
+每批只需两次落盘，而不是每个文件一次。进程在移动途中被结束时，下次启动只检查日志中
+未完成的记录（不需要遍历整个目录）：
+- 源文件已不存在、目标文件存在：移动已完成
+- 残留的 "<目标>.partial"：跨卷复制到一半，删除后重新移动
+- 源文件和目标文件都存在且内容相同：复制已完成但未删除源文件，删除源文件
+- 其余仍存在的源文件：重新移动
+"""
+
+import filecmp
+import os
+import sqlite3
+import threading
+
+# 跨卷复制先写入该后缀的临时文件，完成后再改名为目标文件
+PARTIAL_SUFFIX = ".partial"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS moves (
+    src TEXT PRIMARY KEY,
+    dest TEXT NOT NULL,
+    state TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_moves_state ON moves (state);
+"""
+
+
+class MoveJournal:
+    """移动日志
+
+    db_path: SQLite 文件路径
+    """
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        # 提交时同步写盘，提交返回即记录已落盘
+        self._conn.execute("PRAGMA synchronous = FULL")
+        self._conn.executescript(_SCHEMA)
+        # 已完成的记录只在下次启动前有用
+        self._conn.execute("DELETE FROM moves WHERE state = 'done'")
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def begin(self, plan):
+        """一批移动开始前记录意图：plan 为 [(源路径, 目标路径), ...]"""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO moves (src, dest, state) VALUES (?, ?, 'intent')",
+                [(src, dest) for src, dest in plan],
+            )
+            self._conn.commit()
+
+    def finish(self, sources):
+        """一批移动结束后标记完成（包括失败和已不存在的文件，它们不需要重放）"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE moves SET state = 'done' WHERE src = ?", [(src,) for src in sources]
+            )
+            self._conn.commit()
+
+    def pending(self):
+        """未完成的移动：[(源路径, 目标路径), ...]"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT src, dest FROM moves WHERE state = 'intent' ORDER BY src"
+            ).fetchall()
+
+    def recover(self):
+        """检查上次中断时未完成的移动，清理复制到一半的文件
+
+        返回 (需要重新移动的 [(源路径, 目标路径), ...], 已完成的 [(源路径, 目标路径), ...])；
+        两者都不在的记录（源文件和目标文件都不存在）直接丢弃。
+        需要重新移动的目标路径可能已被其他文件占用，由调用方重新分配名字。
+        """
+        redo = []
+        completed = []
+        resolved = []
+        for src, dest in self.pending():
+            partial = dest + PARTIAL_SUFFIX
+            if os.path.exists(partial):
+                os.remove(partial)
+
+            src_exists = os.path.exists(src)
+            dest_exists = os.path.exists(dest)
+            if src_exists and dest_exists:
+                if filecmp.cmp(src, dest, shallow=False):
+                    # 复制已完成，只差删除源文件
+                    os.remove(src)
+                    completed.append((src, dest))
+                    resolved.append(src)
+                else:
+                    redo.append((src, dest))
+            elif src_exists:
+                redo.append((src, dest))
+            else:
+                if dest_exists:
+                    completed.append((src, dest))
+                resolved.append(src)
+
+        if resolved:
+            self.finish(resolved)
+        return redo, completed
@@ -0,0 +1,488 @@
+"""
+Organizer Engine
+截图整理的核心逻辑（不依赖 Qt）：扫描、按到期规则调度、去重、移动和归档压缩。
+托盘程序、命令行 / 守护进程模式都基于它；Web 服务器与它共用截图目录配置。
+配置了多个截图目录（SCREENSHOTS_PATHS）时逐个扫描和整理，所有目录共用移动线程池、创建时间缓存和到期调度。
+
+本模块只导入纯 Python 依赖；去重（numpy / Pillow）和归档压缩（Pillow）只有启用时才导入，
+无界面模式的启动不会为它们付出导入开销。
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from archive_layout import group_by_target, sharding_enabled
+from ctime_cache import CtimeCache
+from expiry_rules import disabled_policy, load_policy, rules_path
+from expiry_scheduler import ExpiryScheduler
+from file_mover import MoveEngine
+from metrics import SCAN_JOBS
+from move_journal import MoveJournal
+from scanner import ARCHIVE_FOLDER_NAME, scan_screenshots
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # 未安装 watchdog 时 --watch 模式只按到期时刻和每小时核对
+    Observer = None
+    FileSystemEventHandler = object
+
+# 项目目录（程序所在目录），缓存数据库和规则文件都放在这里
+PROJECT_DIR = Path(__file__).parent
+
+# 到期等待的最长时间：电脑睡眠或监听遗漏事件时，至少每小时核对一次
+MAX_EXPIRY_WAIT_SECONDS = 60 * 60
+# 目录变化事件往往成批到达，合并后再重新扫描
+RESCAN_DEBOUNCE_SECONDS = 1.0
+# 守护进程模式单次等待的上限
+WAIT_SLICE_SECONDS = 1.0
+
+# 扫描任务类型，数值越大包含的工作越多，合并请求时取最大值
+JOB_STATUS = 0    # 只统计归档文件夹
+JOB_RESCAN = 1    # 另外列出根目录中的图片，更新到期调度
+JOB_ORGANIZE = 2  # 另外找出到期图片并移动
+JOB_NAMES = {JOB_STATUS: "status", JOB_RESCAN: "rescan", JOB_ORGANIZE: "organize"}
+
+
+def default_screenshots_path():
+    """截图目录：.env 中的 SCREENSHOTS_PATH"""
+    return Path(os.getenv('SCREENSHOTS_PATH', '~/OneDrive/图片/Screenshots')).expanduser()
+
+
+def screenshot_roots(paths=None):
+    """所有截图目录：{名称: 路径}（保持配置顺序）
+
+    .env 中的 SCREENSHOTS_PATHS 为用 os.pathsep（Windows 下为 ;）分隔的多个目录，
+    未设置时只有 SCREENSHOTS_PATH。名称取目录名，重名时依次加 -2、-3。
+    paths: 同样格式的目录字符串（如命令行的 --path），为 None 时读取 .env
+    """
+    configured = os.getenv('SCREENSHOTS_PATHS', '') if paths is None else paths
+    paths = [Path(p.strip()).expanduser() for p in configured.split(os.pathsep) if p.strip()]
+    if not paths:
+        paths = [default_screenshots_path()]
+
+    roots = {}
+    for path in paths:
+        if path in roots.values():
+            continue
+        name = base = path.name or str(path)
+        suffix = 2
+        while name in roots:
+            name = f"{base}-{suffix}"
+            suffix += 1
+        roots[name] = path
+    return roots
+
+
+class RootsScanResult:
+    """所有截图目录一次扫描的结果
+
+    results: {目录名称: ScanResult}
+    expired_files / fresh_files: 各目录的图片合在一起；文件夹计数按目录分别保存在 results 中
+    """
+
+    def __init__(self, results):
+        self.results = results
+        self.expired_files = [item for result in results.values() for item in result.expired_files]
+        self.fresh_files = [item for result in results.values() for item in result.fresh_files]
+
+    @property
+    def root_exists(self):
+        return any(result.root_exists for result in self.results.values())
+
+    @property
+    def has_folders(self):
+        return any(result.has_folders for result in self.results.values())
+
+    @property
+    def total_count(self):
+        return sum(result.total_count for result in self.results.values())
+
+
+class OrganizerEngine:
+    """截图整理核心
+
+    scan() 可以在任意线程中调用；其余方法应在同一个线程（托盘的界面线程或守护进程的主循环）中调用。
+    移动在后台线程中进行，archive() 返回 Future，完成后交给 finish_archive() 处理。
+    screenshots_paths: 用 os.pathsep 分隔的截图目录，为 None 时使用 screenshot_roots() 的配置
+    """
+
+    def __init__(self, screenshots_paths=None, project_dir=PROJECT_DIR):
+        # {名称: 目录}；screenshots_path 为第一个目录
+        self.roots = screenshot_roots(screenshots_paths)
+        self.screenshots_path = next(iter(self.roots.values()))
+        self.project_dir = Path(project_dir)
+
+        # 到期规则（expiry_rules.json）；无效时停止整理（policy_error 为错误信息），规则文件修改后重新读取
+        self.policy = None
+        self.policy_error = None
+        self._rules_mtime = None
+        self._load_policy()
+
+        # 批量移动引擎（每批移动前后写日志，中断后可继续）；查重和移动一起在单独的线程中执行
+        self.move_journal = MoveJournal(self.project_dir / "move_journal.db")
+        self.move_engine = MoveEngine(
+            max_workers=int(os.getenv('MOVE_WORKERS', '4')), journal=self.move_journal
+        )
+        self.archive_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive")
+        self._moving = set()
+        # ARCHIVE_SHARDING=month 时按创建月份归档到 "已到期/YYYY-MM"
+        self.archive_sharded = sharding_enabled()
+
+        # 归档前去重（DEDUP_MODE）：report 只报告重复，collapse 删除与已知文件完全相同的副本
+        self.dedup_mode = os.getenv('DEDUP_MODE', 'off').strip().lower()
+        self.dedup_index = None
+        self._dedup = None
+        if self.dedup_mode in ('report', 'collapse'):
+            import dedup
+            if dedup.available():
+                self._dedup = dedup
+                self.dedup_index = dedup.DuplicateIndex(self.project_dir / "dedup_index.db")
+            else:
+                print("未安装 Pillow / numpy，已关闭去重")
+
+        # 归档后无损重新编码（ARCHIVE_COMPRESS=png / webp），在低优先级进程池中进行
+        self.compressor = None
+        compress_mode = os.getenv('ARCHIVE_COMPRESS', 'off').strip().lower()
+        if compress_mode in ('png', 'webp'):
+            from archive_compressor import ArchiveCompressor
+            if ArchiveCompressor.available():
+                self.compressor = ArchiveCompressor(
+                    self.project_dir / "compress_progress.db",
+                    mode=compress_mode,
+                    cpu_fraction=float(os.getenv('COMPRESS_CPU_FRACTION', '0.5')),
+                    on_replaced=self._on_compressed,
+                )
+                # 上次未处理完的文件会继续处理
+                self.compressor.start()
+            else:
+                print("未安装 Pillow，已关闭归档压缩")
+
+        # 创建时间缓存（与 servers.json 同目录），已知文件无需再次 stat
+        self.ctime_cache = CtimeCache(self.project_dir / "file_cache.db")
+
+        # 到期调度：记录根目录中每个图片的到期时刻（最小堆，按规则的保留时长计算）
+        self.scheduler = ExpiryScheduler(retention_seconds=self.policy.default_rule.retention_seconds)
+        # 上次扫描得到的 {目录名称: {文件夹名: (mtime, 文件数)}}，未变化的文件夹不再重新统计
+        self.folder_cache = {}
+
+        # 上次进程在移动途中被结束时，先在归档线程中继续未完成的移动（之后提交的归档排在它后面）
+        self.archive_pool.submit(self._replay_moves)
+
+    def close(self):
+        self.move_engine.shutdown()
+        self.archive_pool.shutdown(wait=False)
+        if self.compressor is not None:
+            self.compressor.stop()
+        self.ctime_cache.close()
+
+    def _rules_file_mtime(self):
+        try:
+            return rules_path(self.project_dir).stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def _load_policy(self):
+        self._rules_mtime = self._rules_file_mtime()
+        try:
+            self.policy = load_policy(self.project_dir)
+            self.policy_error = None
+        except ValueError as e:
+            self.policy = disabled_policy()
+            self.policy_error = str(e)
+            print(f"到期规则无效，已停止整理（修正规则文件后恢复）: {e}")
+            return
+        for line in self.policy.describe():
+            print(f"[到期规则] {line}")
+
+    def reload_policy(self):
+        """规则文件被修改（或创建、删除）时重新读取，返回是否重新读取了
+
+        应在扫描前调用，之后的重新扫描按新规则重排到期调度
+        """
+        if self._rules_file_mtime() == self._rules_mtime:
+            return False
+        print("到期规则文件已修改，重新读取")
+        self._load_policy()
+        return True
+
+    def _replay_moves(self):
+        """重放移动日志（运行在归档线程）"""
+        try:
+            report = self.move_engine.replay()
+        except Exception as e:
+            print(f"继续上次中断的移动出错: {e}")
+            return
+        if not report.moved and not report.failed:
+            return
+        print(f"继续上次中断的移动: 完成 {report.total_moved} 个文件, 失败 {len(report.failed)} 个")
+        for src, error in report.failed:
+            print(f"  移动文件失败 {Path(src).name}: {error}")
+        if self.dedup_index is not None:
+            self.dedup_index.relocate(report.moved)
+        if self.compressor is not None:
+            self.compressor.submit(dest for _, dest in report.moved)
+
+    def seed_schedule(self):
+        """用缓存中的创建时间排好到期调度，首次扫描完成前即可按时整理"""
+        for root in self.roots.values():
+            for path, created_at in self.ctime_cache.entries(str(root)):
+                self.schedule_file(path, created_at)
+
+    def scan(self, kind, now=None, cached_folders=None):
+        """依次扫描所有截图目录，返回 RootsScanResult（可在工作线程中调用，不修改调度状态）
+
+        cached_folders: {目录名称: {文件夹名: (mtime, 文件数)}}（即 folder_cache）
+        """
+        SCAN_JOBS.inc(kind=JOB_NAMES[kind])
+        if now is None:
+            now = time.time()
+        cached_folders = cached_folders or {}
+        results = {}
+        for name, root in self.roots.items():
+            result = scan_screenshots(
+                root,
+                collect_images=kind != JOB_STATUS,
+                cached_folders=cached_folders.get(name),
+                ctime_cache=self.ctime_cache,
+                name_filter=self.policy.is_candidate,
+            )
+            if kind != JOB_STATUS and result.root_exists:
+                # 按规则一次遍历区分到期 / 未到期，并去掉排除的文件；只有整理任务需要找出到期文件
+                result.expired_files, result.fresh_files = self.policy.split(
+                    result.fresh_files, now if kind == JOB_ORGANIZE else float('-inf')
+                )
+            results[name] = result
+        return RootsScanResult(results)
+
+    def apply_scan(self, kind, result):
+        """记录扫描结果：更新各目录的文件夹计数缓存，列出了根目录时同步到期调度"""
+        missing = []
+        for name, root_result in result.results.items():
+            if not root_result.root_exists:
+                print(f"Screenshots 目录不存在: {self.roots[name]}")
+                self.folder_cache.pop(name, None)
+                missing.append(str(self.roots[name]))
+                continue
+            self.folder_cache[name] = {
+                folder: (root_result.folder_mtimes[folder], count)
+                for folder, count in root_result.folder_counts.items()
+            }
+        if kind >= JOB_RESCAN:
+            present = set()
+            for path, created_at in result.fresh_files + result.expired_files:
+                present.add(path)
+                self.schedule_file(path, created_at)
+            for path in self.scheduler.known_paths() - present:
+                self.scheduler.discard(path)
+        else:
+            # 不存在的目录中不会再有到期文件
+            for path in self.scheduler.known_paths():
+                if os.path.dirname(path) in missing:
+                    self.scheduler.discard(path)
+
+    def schedule_file(self, path, created_at):
+        """按规则的保留时长登记文件；排除的文件不登记"""
+        retention = self.policy.retention_for(Path(path).name)
+        if retention is None:
+            self.scheduler.discard(path)
+        else:
+            self.scheduler.add(path, created_at, retention)
+
+    def seconds_until_next(self):
+        """距离最早到期的秒数，最长 MAX_EXPIRY_WAIT_SECONDS"""
+        wait = self.scheduler.seconds_until_next()
+        return MAX_EXPIRY_WAIT_SECONDS if wait is None else min(wait, MAX_EXPIRY_WAIT_SECONDS)
+
+    def log_expired(self, result):
+        """打印整理扫描找到的到期文件"""
+        now = datetime.now()
+        print(f"\n当前时间: {now.strftime('%Y-%m-%d %H:%M:%S')}")
+        print("按到期规则检查图片")
+        for path, created_at in result.expired_files:
+            creation_time = datetime.fromtimestamp(created_at)
+            print(f"找到匹配文件: {Path(path).name} (创建时间: {creation_time.strftime('%Y-%m-%d %H:%M:%S')}) -> {self.policy.target_for(path)}")
+        if not result.expired_files:
+            print("未找到符合条件的文件")
+
+    def archive(self, items, progress=None):
+        """在后台把到期文件移动到归档文件夹（分片模式下按创建月份分到子文件夹）
+
+        items: [(路径, 创建时间戳), ...]
+        progress: 回调 progress(已完成数, 总数)，在工作线程中调用
+        返回 (提交的源路径列表, Future)；没有需要移动的文件时返回 ([], None)
+        """
+        # 正在移动中的文件不重复提交
+        items = [(str(p), created_at) for p, created_at in items if str(p) not in self._moving]
+        if not items:
+            return [], None
+        if self.policy_error is not None:
+            print(f"到期规则无效，不整理: {self.policy_error}")
+            return [], None
+        sources = [path for path, _ in items]
+        self._moving.update(sources)
+
+        print(f"\n开始整理，共找到 {len(sources)} 个到期文件")
+        for root, folder in self._archive_groups(items)[1]:
+            name = folder.relative_to(root).as_posix()
+            if len(self.roots) > 1:
+                name = f"{root.name}/{name}"
+            print(f"\n创建/使用文件夹: {name}")
+
+        return sources, self.archive_pool.submit(self._dedupe_and_move, items, progress)
+
+    def _archive_groups(self, items):
+        """按各文件所在的截图目录分别计算归档文件夹
+
+        返回 ({目标文件夹: [路径, ...]}, [(截图目录, 目标文件夹), ...])
+        """
+        by_root = {}
+        for path, created_at in items:
+            # 到期文件都直接位于某个截图目录中
+            by_root.setdefault(os.path.dirname(path), []).append((path, created_at))
+        groups = {}
+        folders = []
+        for root, root_items in by_root.items():
+            root = Path(root)
+            for folder, paths in group_by_target(
+                root, root_items, self.archive_sharded, self.policy.target_for
+            ).items():
+                groups.setdefault(folder, []).extend(paths)
+                folders.append((root, folder))
+        return groups, folders
+
+    def _dedupe_and_move(self, items, progress):
+        """查重后移动（运行在归档线程），返回 MoveReport"""
+        collapsed = []
+        near_duplicates = []
+        if self.dedup_index is not None:
+            found = self._dedup.check_batch(self.dedup_index, [path for path, _ in items])
+            for path, (exact, near) in found.items():
+                if exact is not None and self.dedup_mode == 'collapse':
+                    try:
+                        os.remove(path)
+                        collapsed.append((path, exact))
+                    except OSError as e:
+                        print(f"删除重复文件失败 {Path(path).name}: {e}")
+                elif near:
+                    near_duplicates.append((path, near))
+            self.dedup_index.remove({path for path, _ in collapsed})
+
+        removed = {path for path, _ in collapsed}
+        remaining = [(path, created_at) for path, created_at in items if path not in removed]
+        groups, _ = self._archive_groups(remaining)
+        report = self.move_engine.move_grouped(groups, progress=progress)
+        if self.dedup_index is not None:
+            # 索引中的路径跟随文件移动到归档文件夹，之后的截图会与归档比较
+            self.dedup_index.relocate(report.moved)
+        report.collapsed = collapsed
+        report.near_duplicates = near_duplicates
+        return report
+
+    def finish_archive(self, sources, future):
+        """处理移动结果：更新调度、打印明细、提交归档压缩；返回 MoveReport，出错时返回 None"""
+        self._moving.difference_update(sources)
+        for path in sources:
+            self.scheduler.discard(path)
+
+        try:
+            report = future.result()
+        except Exception as e:
+            print(f"移动文件出错: {e}")
+            return None
+
+        for src, dest in report.moved:
+            print(f"  移动文件: {Path(src).name} -> {Path(dest).name}")
+        for src, error in report.failed:
+            print(f"  移动文件失败 {Path(src).name}: {error}")
+        for src, kept in report.collapsed:
+            print(f"  删除重复文件: {Path(src).name} (与 {Path(kept).name} 完全相同)")
+        for src, near in report.near_duplicates:
+            similar = ", ".join(Path(other).name for _, other in near)
+            print(f"  近似重复: {Path(src).name} ~ {similar}")
+
+        print(f"\n整理完成！共移动 {report.total_moved} 个文件到'{ARCHIVE_FOLDER_NAME}'文件夹")
+        if self.compressor is not None:
+            self.compressor.submit(dest for _, dest in report.moved)
+        return report
+
+    def _on_compressed(self, replaced):
+        """文件重新编码后（在压缩线程中调用），同步去重索引中的路径、大小和内容哈希"""
+        if self.dedup_index is not None:
+            self.dedup_index.reencoded(replaced)
+
+    def organize_once(self):
+        """扫描并整理一次（阻塞到移动完成），返回 RootsScanResult"""
+        self.reload_policy()
+        result = self.scan(JOB_ORGANIZE)
+        self.apply_scan(JOB_ORGANIZE, result)
+        if result.root_exists:
+            self.log_expired(result)
+            sources, future = self.archive(result.expired_files)
+            if future is not None:
+                self.finish_archive(sources, future)
+        return result
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    """截图目录有任何变化时设置事件"""
+
+    def __init__(self, changed):
+        super().__init__()
+        self.changed = changed
+
+    def on_any_event(self, event):
+        self.changed.set()
+
+
+def run_watch(engine, stop_event=None):
+    """守护进程模式：监听所有截图目录，睡眠到最早的到期时刻再整理，直到 stop_event 被设置"""
+    stop_event = stop_event or threading.Event()
+    changed = threading.Event()
+    observer = None
+    existing = [root for root in engine.roots.values() if root.exists()]
+    if Observer is not None and existing:
+        observer = Observer()
+        handler = _ChangeHandler(changed)
+        for root in existing:
+            observer.schedule(handler, str(root), recursive=False)
+        observer.daemon = True
+        observer.start()
+
+    engine.seed_schedule()
+    changed.set()  # 启动时先扫描一次
+    try:
+        while not stop_event.is_set():
+            if changed.is_set():
+                # 合并成批到达的事件
+                time.sleep(RESCAN_DEBOUNCE_SECONDS)
+                changed.clear()
+                engine.reload_policy()
+                engine.apply_scan(JOB_RESCAN, engine.scan(JOB_RESCAN, cached_folders=engine.folder_cache))
+
+            due = engine.scheduler.pop_due()
+            if due:
+                print(f"\n[定时执行] 当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                # 已被删除或移走的文件由移动引擎跳过
+                sources, future = engine.archive(due)
+                if future is not None:
+                    engine.finish_archive(sources, future)
+                continue
+
+            # 多等 100 毫秒，避免略早醒来时文件尚未到期；
+            # 分段等待，stop_event 和 Ctrl+C（Windows 下无法打断长时间的 wait）能及时生效
+            deadline = time.monotonic() + engine.seconds_until_next() + 0.1
+            while not stop_event.is_set() and not changed.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # 没有目录变化：到期或最长等待到期，核对一次根目录
+                    changed.set()
+                    break
+                changed.wait(min(remaining, WAIT_SLICE_SECONDS))
+    finally:
+        if observer is not None:
+            observer.stop()
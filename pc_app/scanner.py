@@ -0,0 +1,203 @@
+"""
+Screenshots Scanner
+基于 os.scandir 的单次遍历扫描：一次遍历同时得到到期文件、未到期图片、
+归档文件夹是否存在以及各文件夹的文件数，托盘程序和 Web 服务器共用。
+"""
+
+import os
+import re
+import time
+from datetime import datetime
+
+from metrics import SCAN_DURATION, SCAN_ENTRIES, SCAN_STAT_CALLS
+
+# 整理程序创建的文件夹：旧的 "HH-HH" 时间格式文件夹，或统一的 "已到期" 文件夹
+ARCHIVE_FOLDER_NAME = "已到期"
+TIME_FOLDER_PATTERN = re.compile(r'^\d{2}-\d{2}$')
+# 到期规则可以把文件归档到 "已到期-<名称>"（如 "已到期-游戏"），与 "已到期" 同样计数和分片
+EXPIRED_FOLDER_PATTERN = re.compile(rf'^{ARCHIVE_FOLDER_NAME}(?:-[^/\\]+)?$')
+# 分片归档："已到期/YYYY-MM" 按创建月份分子文件夹，避免单个文件夹中文件过多
+SHARD_FOLDER_PATTERN = re.compile(r'^\d{4}-\d{2}$')
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
+
+
+def is_expired_folder(name):
+    """判断是否是到期归档文件夹（"已到期" 或 "已到期-<名称>"），其中可以包含月份分片"""
+    return EXPIRED_FOLDER_PATTERN.match(name) is not None
+
+
+def is_archive_folder(name):
+    """判断文件夹名是否是整理程序创建的文件夹"""
+    return is_expired_folder(name) or TIME_FOLDER_PATTERN.match(name) is not None
+
+
+def is_shard_name(name):
+    """判断是否是 "已到期" 下的月份分片文件夹名"""
+    return SHARD_FOLDER_PATTERN.match(name) is not None
+
+
+def shard_name(created_at):
+    """创建时间戳所属的分片文件夹名（YYYY-MM）"""
+    return datetime.fromtimestamp(created_at).strftime('%Y-%m')
+
+
+def archive_folder_key(parts):
+    """把相对根目录的路径分段映射到计数键，返回 (键, 剩余分段)
+
+    键是归档文件夹名，分片为 "已到期/YYYY-MM"；不属于归档文件夹时返回 (None, ())
+    """
+    if not parts or not is_archive_folder(parts[0]):
+        return None, ()
+    if is_expired_folder(parts[0]) and len(parts) > 1 and is_shard_name(parts[1]):
+        return f"{parts[0]}/{parts[1]}", tuple(parts[2:])
+    return parts[0], tuple(parts[1:])
+
+
+def is_image_name(name):
+    """按扩展名判断是否是图片文件"""
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def count_files(folder):
+    """统计文件夹中的文件数（DirEntry 自带类型信息，无需逐个 stat）"""
+    with os.scandir(folder) as entries:
+        return sum(1 for entry in entries if entry.is_file())
+
+
+def has_archive_folders(root):
+    """根目录中是否存在任何归档文件夹（找到一个即返回，不统计文件数）"""
+    root = os.fspath(root)
+    if not os.path.isdir(root):
+        return False
+    with os.scandir(root) as entries:
+        return any(entry.is_dir() and is_archive_folder(entry.name) for entry in entries)
+
+
+class ScanResult:
+    """一次扫描的结果
+
+    expired_files: [(路径, 创建时间戳), ...] 早于 expire_before 的图片
+    fresh_files: [(路径, 创建时间戳), ...] 尚未到期的图片
+    folder_counts: 归档文件夹名 -> 文件数（分片以 "已到期/YYYY-MM" 为键单独计数）
+    folder_mtimes: 归档文件夹名 -> st_mtime_ns（用于下次扫描跳过未变化的文件夹）
+    entries_visited / stat_calls / duration: 本次扫描的开销统计
+    """
+
+    def __init__(self, root_exists=False):
+        self.root_exists = root_exists
+        self.expired_files = []
+        self.fresh_files = []
+        self.folder_counts = {}
+        self.folder_mtimes = {}
+        self.entries_visited = 0
+        self.stat_calls = 0
+        self.duration = 0.0
+
+    @property
+    def has_folders(self):
+        return bool(self.folder_counts)
+
+    @property
+    def total_count(self):
+        return sum(self.folder_counts.values())
+
+
+def _scan_folder(path, key, mtime, cached_folders, result):
+    """统计一个归档文件夹，"已到期" 下的分片各自按 mtime 复用或重新统计
+
+    "已到期" 的 mtime 未变化时分片集合也未变化，只需逐个核对已知分片的 mtime，
+    不必列举 "已到期" 本身。
+    """
+    result.folder_mtimes[key] = mtime
+    cached = cached_folders.get(key) if cached_folders else None
+    if cached is not None and cached[0] == mtime:
+        result.folder_counts[key] = cached[1]
+        if is_expired_folder(key):
+            prefix = key + "/"
+            for shard_key in [k for k in cached_folders if k.startswith(prefix)]:
+                shard_path = os.path.join(path, shard_key[len(prefix):])
+                try:
+                    shard_mtime = os.stat(shard_path).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                result.stat_calls += 1
+                _scan_folder(shard_path, shard_key, shard_mtime, cached_folders, result)
+        return
+
+    files = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            result.entries_visited += 1
+            if entry.is_file():
+                files += 1
+            elif entry.is_dir() and is_expired_folder(key) and is_shard_name(entry.name):
+                result.stat_calls += 1
+                _scan_folder(entry.path, f"{key}/{entry.name}", entry.stat().st_mtime_ns,
+                             cached_folders, result)
+    result.folder_counts[key] = files
+
+
+def count_archive_folder(root, name):
+    """统计单个归档文件夹（含分片），返回 {计数键: 文件数}"""
+    path = os.path.join(os.fspath(root), name)
+    result = ScanResult(root_exists=True)
+    _scan_folder(path, name, os.stat(path).st_mtime_ns, None, result)
+    return result.folder_counts
+
+
+def scan_screenshots(root, expire_before=None, collect_images=True, cached_folders=None,
+                     ctime_cache=None, name_filter=is_image_name):
+    """单次遍历 Screenshots 根目录
+
+    root: 截图根目录
+    expire_before: 创建时间戳早于该值的图片记为到期；为 None 时全部记为未到期
+    collect_images: 为 False 时不收集根目录中的图片（只统计文件夹）
+    cached_folders: {文件夹名: (st_mtime_ns, 文件数)}，mtime 未变化的文件夹直接复用计数
+    ctime_cache: CtimeCache，已知文件的创建时间直接从缓存读取
+    name_filter: 根目录中哪些文件需要收集（默认按图片扩展名）
+    """
+    started = time.perf_counter()
+    root = os.fspath(root)
+    if not os.path.isdir(root):
+        return ScanResult(root_exists=False)
+
+    result = ScanResult(root_exists=True)
+    image_names = set()
+    cache_stats_before = ctime_cache.stat_calls if ctime_cache is not None else 0
+    with os.scandir(root) as entries:
+        for entry in entries:
+            result.entries_visited += 1
+            if entry.is_dir():
+                if not is_archive_folder(entry.name):
+                    continue
+                result.stat_calls += 1
+                _scan_folder(entry.path, entry.name, entry.stat().st_mtime_ns, cached_folders, result)
+                continue
+
+            if not collect_images or not entry.is_file() or not name_filter(entry.name):
+                continue
+
+            if ctime_cache is not None:
+                image_names.add(entry.name)
+                created_at = ctime_cache.created_at(root, entry)
+            else:
+                # Windows 下 DirEntry.stat() 直接使用目录列举时返回的信息，不产生额外系统调用
+                created_at = entry.stat().st_ctime
+                result.stat_calls += 1
+            if expire_before is not None and created_at < expire_before:
+                result.expired_files.append((entry.path, created_at))
+            else:
+                result.fresh_files.append((entry.path, created_at))
+
+    if ctime_cache is not None:
+        result.stat_calls += ctime_cache.stat_calls - cache_stats_before
+        if collect_images:
+            ctime_cache.retain(root, image_names)
+            ctime_cache.flush()
+
+    result.duration = time.perf_counter() - started
+    SCAN_DURATION.observe(result.duration)
+    SCAN_ENTRIES.observe(result.entries_visited)
+    SCAN_STAT_CALLS.observe(result.stat_calls)
+    return result
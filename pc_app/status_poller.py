@@ -0,0 +1,308 @@
+"""
+Status Poller
+统一轮询所有远程服务器的 /api/status：
+有界线程池执行请求，按主机复用 keep-alive 连接，同一服务器正在轮询时不重复发起；
+带 If-None-Match 发起条件请求，状态未变化（304）时不解析也不回调。
+服务器支持长轮询时，为每个服务器保持一个 ?wait=<etag> 请求，状态变化即时推送。
+PollSchedule 为每个服务器计算自适应的定时轮询间隔。
+"""
+
+import http.client
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+# 长轮询每次请求让服务器最多等待的秒数
+LONG_POLL_TIMEOUT = 25
+# 长轮询被拒绝（立即返回 304 等）后多久再尝试，连续被拒绝时加倍，最长 WATCH_RETRY_MAX
+WATCH_RETRY_AFTER = 60
+WATCH_RETRY_MAX = 30 * 60
+# 只请求托盘用到的字段（旧版服务器忽略该参数，返回完整响应）
+STATUS_PATH = "/api/status?fields=totalCount,message"
+
+# 自适应轮询间隔（秒）：默认、状态刚变化后、长时间稳定后、离线退避上限
+POLL_INTERVAL = 60
+POLL_FAST_INTERVAL = 15
+POLL_SLOW_INTERVAL = 300
+POLL_MAX_BACKOFF = 30 * 60
+# 状态变化后快速轮询的时长；多久未变化视为稳定
+POLL_FAST_WINDOW = 3 * 60
+POLL_STABLE_AFTER = 30 * 60
+# 每个间隔随机浮动的比例，避免多个客户端同时发请求
+POLL_JITTER = 0.2
+# 离线服务器的探测请求超时（秒）：局域网内在线的机器远快于此
+OFFLINE_PROBE_TIMEOUT = 1.5
+
+
+class PollSchedule:
+    """单个服务器的自适应轮询间隔
+
+    - 连续失败 n 次：POLL_INTERVAL * 2^(n-1)，最长 POLL_MAX_BACKOFF
+    - 状态在 POLL_FAST_WINDOW 内变化过：POLL_FAST_INTERVAL
+    - 超过 POLL_STABLE_AFTER 未变化：POLL_SLOW_INTERVAL
+    - 其余：POLL_INTERVAL
+    所有间隔随机浮动 ±POLL_JITTER。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """服务器地址改变时调用：清除失败次数和变化记录"""
+        self.failures = 0
+        # 上次状态变化的时刻，None 表示重置后尚未变化过
+        self.last_change = None
+        self._since = time.monotonic()
+
+    def record(self, ok, changed):
+        """记录一次轮询结果；changed 表示状态（在线情况或数量）发生了变化"""
+        if ok:
+            self.failures = 0
+        else:
+            self.failures += 1
+        if changed:
+            self.last_change = self._since = time.monotonic()
+
+    def reset_backoff(self):
+        """网络恢复时调用：清除失败次数，下次按正常间隔轮询"""
+        self.failures = 0
+
+    def next_delay(self):
+        """距离下次轮询的秒数"""
+        if self.failures:
+            delay = min(POLL_INTERVAL * 2 ** (self.failures - 1), POLL_MAX_BACKOFF)
+        else:
+            since_change = time.monotonic() - self._since
+            if self.last_change is not None and since_change < POLL_FAST_WINDOW:
+                delay = POLL_FAST_INTERVAL
+            elif since_change >= POLL_STABLE_AFTER:
+                delay = POLL_SLOW_INTERVAL
+            else:
+                delay = POLL_INTERVAL
+        return delay * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+
+class StatusPoller:
+    """远程状态轮询服务
+
+    max_workers: 同时进行的请求数上限
+    timeout: 单次请求超时（秒）
+    max_watchers: 同时保持的长轮询数上限，超出的服务器继续定时轮询
+    """
+
+    def __init__(self, max_workers=4, timeout=4, max_watchers=16):
+        self.timeout = timeout
+        self.max_watchers = max_watchers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="poller")
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        # key -> 上次 200 响应的 ETag
+        self._etags = {}
+        # (host, port) -> [空闲连接, ...]
+        self._idle = {}
+        # key -> 长轮询线程的令牌；令牌被替换或移除时线程自行退出
+        self._watching = {}
+        # 长轮询被拒绝的服务器: key -> (可再次尝试的时刻 time.monotonic, 连续被拒绝次数)
+        # 服务器的等待名额已满时也会立即返回 304，因此只暂停一段时间而不是永久放弃
+        self._no_watch = {}
+        self._closed = False
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            self._watching.clear()
+        self._pool.shutdown(wait=False)
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+    def forget(self, key):
+        """丢弃 key 的 ETag 和长轮询（服务器地址改变或删除时调用），下次轮询必定拿到完整响应"""
+        with self._lock:
+            self._etags.pop(key, None)
+            self._watching.pop(key, None)
+            self._no_watch.pop(key, None)
+
+    def watch(self, key, host, port, callback):
+        """为 key 建立长轮询；已在长轮询中或成功建立时返回 True
+
+        需要先有一次带 ETag 的完整响应。返回 False 时调用方应继续定时轮询。
+        callback(ok, count, message) 在长轮询线程中调用
+        """
+        with self._lock:
+            if key in self._watching:
+                return True
+            retry_at, _ = self._no_watch.get(key, (0, 0))
+            if (self._closed or time.monotonic() < retry_at or key not in self._etags
+                    or len(self._watching) >= self.max_watchers):
+                return False
+            token = object()
+            self._watching[key] = token
+        thread = threading.Thread(
+            target=self._watch_loop, args=(key, token, host, str(port), callback), daemon=True
+        )
+        thread.start()
+        return True
+
+    def _watch_loop(self, key, token, host, port, callback):
+        conn = http.client.HTTPConnection(host, int(port), timeout=LONG_POLL_TIMEOUT + self.timeout)
+        try:
+            while True:
+                with self._lock:
+                    if self._watching.get(key) is not token:
+                        return
+                    etag = self._etags.get(key)
+                if not etag:
+                    return
+
+                # 服务器返回弱 ETag（W/"..."），wait 参数只需要引号内的值
+                wait = quote((etag[2:] if etag.startswith('W/') else etag).strip('"'))
+                path = f"{STATUS_PATH}&wait={wait}&timeout={LONG_POLL_TIMEOUT}"
+                started = time.monotonic()
+                conn.request("GET", path, headers={"If-None-Match": etag})
+                resp = conn.getresponse()
+                body = resp.read()
+                if resp.will_close:
+                    conn.close()  # 下次 request 时自动重连
+
+                if resp.status == 304:
+                    # 支持长轮询的服务器只会在等待超时后才返回 304
+                    if time.monotonic() - started < LONG_POLL_TIMEOUT / 2:
+                        self._mark_no_watch(key)
+                        return
+                    self._watch_succeeded(key)
+                    continue
+
+                new_etag = resp.headers.get("ETag")
+                if resp.status != 200 or not new_etag or new_etag == etag:
+                    self._mark_no_watch(key)
+                    return
+
+                data = json.loads(body.decode("utf-8"))
+                count = int(data.get("totalCount", 0))
+                message = data.get("message", f"在线，共 {count} 个文件")
+                with self._lock:
+                    if self._watching.get(key) is not token:
+                        return
+                    self._etags[key] = new_etag
+                    self._no_watch.pop(key, None)
+                callback(True, count, message)
+        except Exception as e:
+            # 连接失败：丢弃 ETag，回到定时轮询
+            with self._lock:
+                if self._watching.get(key) is not token:
+                    return
+                self._etags.pop(key, None)
+            callback(False, 0, str(e))
+        finally:
+            conn.close()
+            with self._lock:
+                if self._watching.get(key) is token:
+                    del self._watching[key]
+
+    def _mark_no_watch(self, key):
+        with self._lock:
+            _, failures = self._no_watch.get(key, (0, 0))
+            delay = min(WATCH_RETRY_AFTER * 2 ** failures, WATCH_RETRY_MAX)
+            self._no_watch[key] = (time.monotonic() + delay, failures + 1)
+
+    def _watch_succeeded(self, key):
+        with self._lock:
+            self._no_watch.pop(key, None)
+
+    def poll(self, key, host, port, callback, timeout=None):
+        """提交一次轮询；同一 key 已在轮询中时直接返回 False
+
+        callback(ok, count, message) 在工作线程中调用；状态未变化（304）时不调用
+        timeout: 本次请求的超时，None 时使用 self.timeout（探测离线服务器时用更短的超时）
+        """
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+        self._pool.submit(self._poll_worker, key, host, str(port), callback, timeout)
+        return True
+
+    def _poll_worker(self, key, host, port, callback, timeout=None):
+        with self._lock:
+            etag = self._etags.get(key)
+        headers = {"If-None-Match": etag} if etag else {}
+        try:
+            status, resp_headers, body = self.request(host, port, STATUS_PATH, headers, timeout)
+            if status == 304:
+                result = None
+            elif status == 200:
+                data = json.loads(body.decode("utf-8"))
+                count = int(data.get("totalCount", 0))
+                message = data.get("message", f"在线，共 {count} 个文件")
+                result = (True, count, message)
+                etag = resp_headers.get("ETag")
+            else:
+                raise RuntimeError(f"HTTP {status}")
+        except Exception as e:
+            result = (False, 0, str(e))
+            etag = None
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+        if result is None:
+            return
+        with self._lock:
+            if etag:
+                self._etags[key] = etag
+            else:
+                self._etags.pop(key, None)
+        callback(*result)
+
+    def request(self, host, port, path, headers=None, timeout=None):
+        """GET 请求，返回 (状态码, 响应头, 响应体)；优先复用该主机的空闲连接
+
+        http.client 不读取系统代理设置，局域网 IP 直连
+        """
+        headers = headers or {}
+        timeout = timeout or self.timeout
+        conn, reused = self._acquire(host, port, timeout)
+        try:
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.HTTPException, ConnectionError):
+                if not reused:
+                    raise
+                # 空闲连接可能已被服务端关闭，换一条新连接重试一次
+                conn.close()
+                conn = http.client.HTTPConnection(host, int(port), timeout=timeout)
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+            body = resp.read()
+        except Exception:
+            conn.close()
+            raise
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(host, port, conn)
+        return resp.status, resp.headers, body
+
+    def _acquire(self, host, port, timeout):
+        with self._lock:
+            connections = self._idle.get((host, port))
+            conn = connections.pop() if connections else None
+        if conn is not None:
+            # 空闲连接可能由超时不同的请求（如 1.5 秒的离线探测）创建，按本次请求的超时重新设置
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+            return conn, True
+        return http.client.HTTPConnection(host, int(port), timeout=timeout), False
+
+    def _release(self, host, port, conn):
+        with self._lock:
+            self._idle.setdefault((host, port), []).append(conn)
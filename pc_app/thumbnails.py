@@ -0,0 +1,183 @@
+"""
+Thumbnails
+归档截图的缩略图：在进程池中生成（解码和缩放是 CPU 密集型，不占用 Web 工作线程的 GIL），
+按 路径 + mtime + 大小 + 尺寸 + 格式 的哈希存入磁盘缓存，总字节数超出上限时淘汰最久未使用的文件。
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:  # 未安装 Pillow 时缩略图接口不可用
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# 格式名 -> (Pillow 格式, MIME 类型, 扩展名)
+THUMB_FORMATS = {
+    'webp': ('WEBP', 'image/webp', '.webp'),
+    'jpeg': ('JPEG', 'image/jpeg', '.jpg'),
+}
+DEFAULT_THUMB_SIZE = 256
+MIN_THUMB_SIZE = 32
+MAX_THUMB_SIZE = 1024
+
+
+def _pid_alive(pid):
+    """进程是否仍在运行（无法确定时按仍在运行处理）"""
+    if os.name == 'nt':
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        ERROR_ACCESS_DENIED = 5
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return kernel32.GetLastError() == ERROR_ACCESS_DENIED
+        try:
+            code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return True
+            return code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _render_thumbnail(src, dest, max_size, pil_format):
+    """在子进程中生成缩略图：先写临时文件再改名，读取方不会看到写了一半的文件"""
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    with Image.open(src) as image:
+        image.thumbnail((max_size, max_size))
+        if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(tmp, pil_format, quality=80)
+    os.replace(tmp, dest)
+    return os.path.getsize(dest)
+
+
+class ThumbnailCache:
+    """缩略图磁盘缓存
+
+    cache_dir: 缓存目录（文件名即缓存键，同一源文件内容变化后键也随之变化）
+    max_bytes: 缓存总字节数上限
+    max_workers: 生成缩略图的进程数
+    """
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, max_workers=2):
+        self.cache_dir = os.fspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # 缓存文件名 -> 字节数，按最近使用排序（最久未使用的在前）
+        self._entries = OrderedDict()
+        self._total = 0
+        # 缓存键 -> 生成中的 Future，同一缩略图的并发请求只生成一次
+        self._pending = {}
+        # 进程池在首次生成时才创建
+        self._pool = None
+
+        # 启动时按访问时间恢复 LRU 顺序；残留的临时文件（"<缓存文件名>.<pid>.tmp"）只删除进程已退出的，
+        # 其他服务器进程正在写入的临时文件保留
+        existing = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith('.tmp'):
+                    self._remove_stale_tmp(entry)
+                    continue
+                st = entry.stat()
+                existing.append((st.st_atime, entry.name, st.st_size))
+        for _, name, size in sorted(existing):
+            self._entries[name] = size
+            self._total += size
+
+    @staticmethod
+    def _remove_stale_tmp(entry):
+        pid = entry.name.rsplit('.', 2)[-2]
+        if pid.isdigit() and _pid_alive(int(pid)):
+            return
+        try:
+            os.remove(entry.path)
+        except OSError:
+            # 已被写入方改名或删除
+            pass
+
+    @staticmethod
+    def available():
+        return Image is not None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+
+    def cache_key(self, src, st, max_size, fmt):
+        raw = f"{os.path.abspath(src)}\0{st.st_mtime_ns}\0{st.st_size}\0{max_size}\0{fmt}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get(self, src, max_size=DEFAULT_THUMB_SIZE, fmt='webp'):
+        """返回 (缩略图路径, 缓存键)，需要时在进程池中生成（阻塞到生成完成）
+
+        源文件不存在时抛出 FileNotFoundError
+        """
+        src = os.fspath(src)
+        pil_format, _, suffix = THUMB_FORMATS[fmt]
+        st = os.stat(src)
+        key = self.cache_key(src, st, max_size, fmt)
+        name = key + suffix
+        dest = os.path.join(self.cache_dir, name)
+
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+                return dest, key
+            future = self._pending.get(key)
+            if future is None:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                future = self._pool.submit(_render_thumbnail, src, dest, max_size, pil_format)
+                self._pending[key] = future
+                owner = True
+            else:
+                owner = False
+
+        try:
+            size = future.result()
+        finally:
+            if owner:
+                with self._lock:
+                    self._pending.pop(key, None)
+
+        if owner:
+            self._add(name, size)
+        return dest, key
+
+    def _add(self, name, size):
+        """登记新生成的缩略图，超出上限时淘汰最久未使用的文件"""
+        evicted = []
+        with self._lock:
+            self._entries[name] = size
+            self._total += size
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_name, old_size = self._entries.popitem(last=False)
+                self._total -= old_size
+                evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                os.remove(os.path.join(self.cache_dir, old_name))
+            except OSError as e:
+                logger.warning("删除缩略图缓存失败 %s: %s", old_name, e)
@@ -0,0 +1,832 @@
+"""
+Screenshots Tray App
+自动整理截图的系统托盘程序（整理逻辑见 organizer_engine，由 screenshot_organizer.py 启动）
+"""
+
+import sys
+import os
+import json
+import webbrowser
+from collections import OrderedDict
+from pathlib import Path
+from datetime import datetime
+from PyQt5.QtWidgets import (
+    QApplication, QSystemTrayIcon, QMenu, QAction, QMessageBox,
+    QDialog, QFormLayout, QLineEdit, QDialogButtonBox
+)
+from PyQt5.QtCore import QTimer, Qt, QObject, QThread, pyqtSignal, QFileSystemWatcher
+from PyQt5.QtGui import QIcon, QPixmap, QPainter, QFont, QColor
+
+try:
+    from PyQt5.QtNetwork import QNetworkConfigurationManager
+except ImportError:  # 没有 QtNetwork 时只靠其他服务器恢复在线来判断网络恢复
+    QNetworkConfigurationManager = None
+
+from metrics import REGISTRY
+from organizer_engine import (
+    JOB_ORGANIZE, JOB_RESCAN, JOB_STATUS, MAX_EXPIRY_WAIT_SECONDS, RESCAN_DEBOUNCE_SECONDS,
+    OrganizerEngine,
+)
+from status_poller import OFFLINE_PROBE_TIMEOUT, PollSchedule, StatusPoller
+from scanner import ARCHIVE_FOLDER_NAME
+
+# 到期定时器最长等待时间：电脑睡眠或监听遗漏事件时，至少每小时核对一次
+MAX_EXPIRY_WAIT_MS = MAX_EXPIRY_WAIT_SECONDS * 1000
+# 目录变化事件往往成批到达，合并后再重新扫描
+RESCAN_DEBOUNCE_MS = int(RESCAN_DEBOUNCE_SECONDS * 1000)
+
+# 远程服务器首次轮询按序号错开，避免同一时刻集中发请求（之后的间隔见 status_poller.PollSchedule）
+POLL_INTERVAL_MS = 60000
+POLL_STAGGER_MS = 2000
+
+# 已渲染图标的 LRU 缓存：(文字, 背景色, 缩放比例) -> QIcon
+ICON_CACHE_SIZE = 64
+_icon_cache = OrderedDict()
+# 所有图标共用的字体（需在 QApplication 创建后才能构造）
+_icon_font = None
+
+
+def count_icon_text(count):
+    """图标上显示的文字：超过 999 时显示 999+"""
+    return str(count) if count < 1000 else "999+"
+
+
+def create_count_icon(count, bg_color, text=None):
+    """创建带有数字（或自定义文字）的托盘图标
+
+    count: 显示的数字
+    bg_color: QColor 背景颜色
+    text: 若提供，则直接显示该文字（覆盖 count）
+    相同文字、颜色和屏幕缩放比例的图标只渲染一次，之后直接返回缓存的 QIcon
+    """
+    if text is None:
+        text = count_icon_text(count)
+
+    screen = QApplication.primaryScreen()
+    scale = screen.devicePixelRatio() if screen is not None else 1.0
+
+    key = (text, bg_color.rgba(), scale)
+    icon = _icon_cache.get(key)
+    if icon is not None:
+        _icon_cache.move_to_end(key)
+        return icon
+
+    icon = _render_count_icon(text, bg_color, scale)
+    _icon_cache[key] = icon
+    if len(_icon_cache) > ICON_CACHE_SIZE:
+        _icon_cache.popitem(last=False)
+    return icon
+
+
+def _render_count_icon(text, bg_color, scale):
+    """渲染 64x64（逻辑像素）的图标，按屏幕缩放比例提高实际分辨率"""
+    global _icon_font
+    if _icon_font is None:
+        _icon_font = QFont("Arial", 32, QFont.Bold)
+
+    size = 64
+    pixmap = QPixmap(int(size * scale), int(size * scale))
+    pixmap.setDevicePixelRatio(scale)
+    pixmap.fill(bg_color)
+
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setFont(_icon_font)
+
+    metrics = painter.fontMetrics()
+    text_width = metrics.horizontalAdvance(text)
+    text_height = metrics.height()
+
+    text_x = (size - text_width) // 2
+    text_y = (size + text_height) // 2 - metrics.descent()
+
+    painter.setPen(QColor(255, 255, 255))
+    painter.drawText(text_x, text_y, text)
+
+    painter.end()
+    return QIcon(pixmap)
+
+
+class OrganizeWorker(QObject):
+    """在独立线程中执行目录扫描，结果通过信号回到主线程"""
+
+    # 扫描结束: (任务类型, RootsScanResult 或异常)
+    finished = pyqtSignal(int, object)
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+
+    def run(self, kind, now, cached_folders):
+        try:
+            result = self.engine.scan(kind, now, cached_folders)
+        except Exception as e:
+            result = e
+        self.finished.emit(kind, result)
+
+
+class ScreenshotOrganizer(QSystemTrayIcon):
+    # 用户点击"添加新的服务器"时发出
+    add_server_requested = pyqtSignal()
+    # 后台移动进度: (已完成数, 总数)
+    move_progress = pyqtSignal(int, int)
+    # 后台移动结束: (源路径列表, Future)
+    move_finished = pyqtSignal(object, object)
+    # 请求后台扫描: (任务类型, 到期时间戳, 文件夹计数缓存)
+    scan_requested = pyqtSignal(int, object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        # 整理核心（规则、调度、去重、移动、压缩），托盘只负责界面和定时
+        self.engine = OrganizerEngine()
+        self.roots = self.engine.roots
+        self.policy = self.engine.policy
+        self.scheduler = self.engine.scheduler
+
+        # 当前显示的图标和提示，值未变化时不重复设置
+        self._icon = None
+        self._tooltip = None
+
+        # 初始化托盘图标
+        self.setup_tray()
+
+        # 移动在引擎的后台线程中进行，进度和结果通过信号回到主线程
+        self.move_progress.connect(self.on_move_progress)
+        self.move_finished.connect(self.on_move_finished)
+
+        # 扫描线程：所有目录遍历都在这里执行，界面线程不做文件 I/O
+        self.worker_thread = QThread()
+        self.worker = OrganizeWorker(self.engine)
+        self.worker.moveToThread(self.worker_thread)
+        self.scan_requested.connect(self.worker.run)
+        self.worker.finished.connect(self.on_scan_finished)
+        self.worker_thread.start()
+
+        # 所有退出途径（本托盘的"退出"、服务器托盘的"退出全部"）都经过 aboutToQuit 收尾
+        self._shut_down = False
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
+
+        # 单飞：同一时间最多一次扫描，期间的请求合并为一次后续扫描
+        self._scan_in_flight = False
+        self._pending_job = None
+
+        # 监听各截图目录和其中归档文件夹的变化，代替每分钟的全目录轮询
+        self.watcher = QFileSystemWatcher()
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+
+        self.rescan_timer = QTimer()
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.timeout.connect(lambda: self.request_scan(JOB_RESCAN))
+
+        # 单次定时器：睡眠到最早的文件到期时再唤醒
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.check_time_and_run)
+
+        # 程序启动时显示提示
+        if self.engine.policy_error is not None:
+            self.show_policy_error()
+        else:
+            self.showMessage(
+                "截图整理工具已启动",
+                "截图到期时将自动整理",
+                QSystemTrayIcon.Information,
+                2000
+            )
+
+        # 先用缓存中的创建时间排好到期调度，首次扫描完成前即可按时整理
+        self.engine.seed_schedule()
+        self.schedule_next_expiry()
+
+        # 启动时刷新图标，并登记根目录中的图片、开始监听
+        print("\n[启动检查] 自动检测文件夹状态并刷新图标...")
+        self.request_scan(JOB_RESCAN)
+
+    def setup_tray(self):
+        """设置系统托盘"""
+        # 创建托盘菜单
+        menu = QMenu()
+
+        # 添加菜单项
+        organize_action = QAction("立即整理旧截图 (&Z)", menu)
+        organize_action.triggered.connect(self.manual_execute)
+        menu.addAction(organize_action)
+
+        check_status_action = QAction("仅刷新图标状态 (&S)", menu)
+        check_status_action.triggered.connect(self.force_update_icon_status)
+        menu.addAction(check_status_action)
+
+        menu.addSeparator()
+
+        open_folder_action = QAction("打开Screenshots文件夹", menu)
+        open_folder_action.triggered.connect(self.open_screenshots_folder)
+        menu.addAction(open_folder_action)
+
+        menu.addSeparator()
+
+        add_server_action = QAction("添加新的服务器 (&A)", menu)
+        add_server_action.triggered.connect(self.add_server_requested.emit)
+        menu.addAction(add_server_action)
+
+        menu.addSeparator()
+
+        stats_action = QAction("运行统计 (&T)", menu)
+        stats_action.triggered.connect(self.show_stats)
+        menu.addAction(stats_action)
+
+        about_action = QAction("关于", menu)
+        about_action.triggered.connect(self.show_about)
+        menu.addAction(about_action)
+
+        quit_action = QAction("退出 (&X)", menu)
+        quit_action.triggered.connect(self.quit_app)
+        menu.addAction(quit_action)
+
+        self.setContextMenu(menu)
+
+        # 设置初始图标
+        self.update_icon(False, 0)
+
+        # 设置工具提示
+        self.set_tooltip(f"Screenshots 自动整理工具\n{self.status_line()}")
+
+        # 显示托盘图标
+        self.show()
+
+    def update_icon(self, has_new_folder, total_count):
+        """更新托盘图标，动态显示条目数（total_count 来自扫描结果）"""
+        # 创建带数字的图标
+        icon_with_count = self.create_icon_with_count(has_new_folder, total_count)
+        if icon_with_count is not self._icon:
+            self._icon = icon_with_count
+            self.setIcon(icon_with_count)
+
+        # 更新工具提示
+        if total_count > 0:
+            self.set_tooltip(f"Screenshots 自动整理工具\nPC有 {total_count} 个文件\n{self.status_line()}")
+        else:
+            self.set_tooltip(f"Screenshots 自动整理工具\n{self.status_line()}")
+
+    def status_line(self):
+        """工具提示中的整理状态"""
+        if self.engine.policy_error is not None:
+            return "到期规则无效，已停止整理"
+        return "截图到期时自动执行"
+
+    def show_policy_error(self):
+        """提示到期规则无效（修正规则文件之前不会整理任何文件）"""
+        self.showMessage(
+            "到期规则无效，已停止整理",
+            f"{self.engine.policy_error}\n修正规则文件后自动恢复",
+            QSystemTrayIcon.Warning,
+            10000
+        )
+
+    def set_tooltip(self, text):
+        """设置工具提示（与当前相同时跳过）"""
+        if text != self._tooltip:
+            self._tooltip = text
+            self.setToolTip(text)
+
+    def create_icon_with_count(self, has_new_folder, count):
+        """创建带有数字的图标（本地截图：红色背景）"""
+        return create_count_icon(count, QColor(255, 0, 0))
+
+    def check_time_and_run(self):
+        """到期定时器触发：只整理已到期的文件"""
+        now = datetime.now()
+        print(f"\n[定时执行] 当前时间: {now.strftime('%Y-%m-%d %H:%M:%S')}")
+
+        due = self.scheduler.pop_due()
+        if due:
+            # 已被删除或移走的文件由移动引擎跳过
+            self.archive_files(due)
+            self.schedule_next_expiry()
+        else:
+            # 没有到期文件（最长等待到期），顺便核对一次根目录
+            self.request_scan(JOB_RESCAN)
+
+    def on_directory_changed(self, path):
+        """截图目录或归档文件夹发生变化"""
+        self.rescan_timer.start(RESCAN_DEBOUNCE_MS)
+
+    def request_scan(self, kind):
+        """请求一次后台扫描；已有扫描进行中时只记录下来，结束后合并为一次"""
+        if self._scan_in_flight:
+            if self._pending_job is None or kind > self._pending_job:
+                self._pending_job = kind
+            return
+        self._start_scan(kind)
+
+    def _start_scan(self, kind):
+        # 扫描前检查规则文件是否被修改（此时没有扫描在进行）
+        if self.engine.reload_policy():
+            if self.engine.policy_error is not None:
+                self.show_policy_error()
+            else:
+                self.showMessage("到期规则已更新", "截图到期时将按新规则整理",
+                                 QSystemTrayIcon.Information, 3000)
+            if kind < JOB_RESCAN:
+                # 按新规则重排到期调度
+                kind = JOB_RESCAN
+        self._scan_in_flight = True
+        self.scan_requested.emit(kind, datetime.now().timestamp(), dict(self.engine.folder_cache))
+
+    def on_scan_finished(self, kind, result):
+        """后台扫描结束（运行在主线程）"""
+        self._scan_in_flight = False
+
+        if isinstance(result, Exception):
+            print(f"检查过程出错: {result}")
+            self.update_icon(False, 0)
+        elif not result.root_exists:
+            self.engine.apply_scan(kind, result)
+            self.update_icon(False, 0)
+            self.schedule_next_expiry()
+        else:
+            self.engine.apply_scan(kind, result)
+            if kind == JOB_ORGANIZE:
+                self.handle_organize_result(result)
+            if kind >= JOB_RESCAN:
+                self.apply_root_listing(result)
+            self.update_icon(result.has_folders, result.total_count)
+            if kind == JOB_STATUS:
+                print(f"图标状态已更新为: {'有' if result.has_folders else '无'}")
+
+        if self._pending_job is not None:
+            kind, self._pending_job = self._pending_job, None
+            self._start_scan(kind)
+
+    def apply_root_listing(self, result):
+        """到期调度已由引擎更新；补充监听路径，然后重新调度"""
+        watch_paths = []
+        for name, root_result in result.results.items():
+            if not root_result.root_exists:
+                continue
+            root = self.roots[name]
+            watch_paths.append(str(root))
+            watch_paths += [str(root / folder) for folder in root_result.folder_counts]
+        watched = set(self.watcher.directories())
+        missing = [p for p in watch_paths if p not in watched]
+        if missing:
+            self.watcher.addPaths(missing)
+
+        self.schedule_next_expiry()
+
+    def schedule_next_expiry(self):
+        """把到期定时器设到最早的到期时刻"""
+        # 多等 100 毫秒，避免定时器略早触发时文件尚未到期
+        wait_ms = min(int(self.engine.seconds_until_next() * 1000) + 100, MAX_EXPIRY_WAIT_MS)
+        self.timer.start(wait_ms)
+
+    def manual_execute(self):
+        """手动执行一次"""
+        print("\n[手动执行] 用户手动触发检查")
+        self.showMessage(
+            "手动执行",
+            "正在检查并整理截图...",
+            QSystemTrayIcon.Information,
+            1000
+        )
+        self.check_and_organize()
+
+    def force_update_icon_status(self):
+        """仅检查文件夹状态并更新图标"""
+        print("\n[手动状态检测] 用户手动触发图标状态更新")
+        self.showMessage(
+            "状态检测",
+            "正在检查文件夹状态...",
+            QSystemTrayIcon.Information,
+            1000
+        )
+        self.request_scan(JOB_STATUS)
+
+    def check_and_organize(self):
+        """在后台扫描并整理图片"""
+        self.request_scan(JOB_ORGANIZE)
+
+    def handle_organize_result(self, result):
+        """处理整理扫描的结果：打印并移动到期文件"""
+        self.engine.log_expired(result)
+        # 如果有符合条件的文件，在后台移动（完成后会再刷新一次图标）
+        if result.expired_files:
+            self.archive_files(result.expired_files)
+
+    def archive_files(self, items):
+        """在后台把到期文件移动到"已到期"文件夹（分片模式下按创建月份分到子文件夹）
+
+        items: [(路径, 创建时间戳), ...]
+        返回本次提交移动的文件数；结果通过 move_finished 信号回到主线程处理
+        """
+        sources, future = self.engine.archive(items, progress=self.move_progress.emit)
+        if future is None:
+            return 0
+        # 回调在工作线程中执行，经信号排队到主线程
+        future.add_done_callback(lambda f: self.move_finished.emit(sources, f))
+        return len(sources)
+
+    def on_move_progress(self, done, total):
+        """移动进度回调（运行在主线程）"""
+        self.set_tooltip(f"Screenshots 自动整理工具\n正在整理: {done}/{total}")
+
+    def on_move_finished(self, sources, future):
+        """移动结束回调（运行在主线程）"""
+        report = self.engine.finish_archive(sources, future)
+        if report is not None and (report.total_moved or report.collapsed):
+            message = f"已将 {report.total_moved} 个文件移动到'{ARCHIVE_FOLDER_NAME}'文件夹"
+            if report.collapsed:
+                message += f"，删除 {len(report.collapsed)} 个重复文件"
+            # 显示通知
+            self.showMessage(
+                "截图已整理",
+                message,
+                QSystemTrayIcon.Information,
+                3000
+            )
+        self.request_scan(JOB_STATUS)
+
+    def open_screenshots_folder(self):
+        """打开所有存在的 Screenshots 文件夹"""
+        existing = [root for root in self.roots.values() if root.exists()]
+        for root in existing:
+            os.startfile(str(root))
+        if not existing:
+            QMessageBox.warning(
+                None,
+                "文件夹不存在",
+                "Screenshots 文件夹不存在:\n" + "\n".join(str(root) for root in self.roots.values())
+            )
+
+    def show_stats(self):
+        """显示本进程内扫描和移动的耗时统计"""
+        lines = REGISTRY.summary_lines()
+        QMessageBox.information(
+            None,
+            "运行统计",
+            "\n".join(lines) if lines else "暂无统计数据"
+        )
+
+    def show_about(self):
+        """显示关于对话框"""
+        QMessageBox.information(
+            None,
+            "关于",
+            "Screenshots 自动整理工具\n\n"
+            "自动检测并整理 OneDrive Screenshots 文件夹中的图片\n"
+            "监听截图目录，截图到期时自动整理\n\n"
+            "功能：按到期规则把截图归档到'已到期'文件夹\n\n"
+            + "\n".join(self.policy.describe())
+        )
+
+    def quit_app(self):
+        """退出应用（收尾由 aboutToQuit 触发的 shutdown 完成）"""
+        QApplication.quit()
+
+    def shutdown(self):
+        """停止定时器，等扫描线程结束后关闭引擎（数据库、线程池、移动日志）"""
+        if self._shut_down:
+            return
+        self._shut_down = True
+        self.timer.stop()
+        self.rescan_timer.stop()
+        self.worker_thread.quit()
+        # 线程仍在运行时销毁 QThread 会使 Qt 直接中止进程，必须等扫描结束
+        self.worker_thread.wait()
+        self.engine.close()
+
+
+class ServerDialog(QDialog):
+    """添加 / 编辑服务器的对话框，输入主机名、IP、端口"""
+
+    def __init__(self, parent=None, hostname="", ip="", port="5001", title="添加新的服务器"):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.setMinimumWidth(420)
+
+        # 放大整个对话框的字体（标签、输入框、按钮都会继承）
+        dialog_font = QFont()
+        dialog_font.setPointSize(14)
+        self.setFont(dialog_font)
+
+        layout = QFormLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        layout.setSpacing(14)
+
+        self.hostname_edit = QLineEdit(hostname)
+        self.hostname_edit.setPlaceholderText("例如：客厅电脑")
+        self.ip_edit = QLineEdit(ip)
+        self.ip_edit.setPlaceholderText("例如：192.168.1.100")
+        self.port_edit = QLineEdit(str(port))
+        self.port_edit.setPlaceholderText("例如：5001")
+
+        # 输入框高度更舒适
+        for edit in (self.hostname_edit, self.ip_edit, self.port_edit):
+            edit.setMinimumHeight(32)
+
+        layout.addRow("主机名:", self.hostname_edit)
+        layout.addRow("IP 地址:", self.ip_edit)
+        layout.addRow("端口:", self.port_edit)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.button(QDialogButtonBox.Ok).setText("确定")
+        buttons.button(QDialogButtonBox.Cancel).setText("取消")
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def get_values(self):
+        """返回 (主机名, IP, 端口)，均已去除首尾空白"""
+        return (
+            self.hostname_edit.text().strip(),
+            self.ip_edit.text().strip(),
+            self.port_edit.text().strip(),
+        )
+
+
+class ServerTrayIcon(QSystemTrayIcon):
+    """代表一个远程服务器的托盘图标，定时轮询其 /api/status 接口"""
+
+    # 后台线程轮询完成后发出: (是否在线, 文件数, 状态消息)
+    status_signal = pyqtSignal(bool, int, str)
+
+    def __init__(self, manager, hostname, ip, port, start_delay_ms=0, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self.hostname = hostname
+        self.ip = ip
+        self.port = str(port)
+
+        self.online = False
+        self.count = 0
+        self.last_message = "尚未连接"
+        # 是否已收到过结果（首次结果不算状态变化）
+        self.has_result = False
+
+        # 当前显示的图标和提示，值未变化时不重复设置
+        self._icon = None
+        self._tooltip = None
+
+        # 跨线程更新界面：信号自动排队到主线程执行
+        self.status_signal.connect(self.on_status)
+
+        self.setup_menu()
+        self.update_display()
+        self.show()
+
+        # 自适应轮询：离线时指数退避，状态刚变化时加快，长时间稳定时放慢；首次轮询按 start_delay_ms 错开
+        self.schedule = PollSchedule()
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.poll)
+        self.start_timer = QTimer()
+        self.start_timer.setSingleShot(True)
+        self.start_timer.timeout.connect(self.poll)
+        self.start_timer.start(start_delay_ms)
+
+    def schedule_next_poll(self):
+        """按当前状态重新设置下次轮询的时刻"""
+        self.timer.start(int(self.schedule.next_delay() * 1000))
+
+    def setup_menu(self):
+        """构建服务器图标的右键菜单"""
+        menu = QMenu()
+
+        refresh_action = QAction("刷新状态 (&S)", menu)
+        refresh_action.triggered.connect(self.poll)
+        menu.addAction(refresh_action)
+
+        open_web_action = QAction("打开网页", menu)
+        open_web_action.triggered.connect(self.open_web)
+        menu.addAction(open_web_action)
+
+        menu.addSeparator()
+
+        edit_action = QAction("编辑服务器", menu)
+        edit_action.triggered.connect(lambda: self.manager.edit_server(self))
+        menu.addAction(edit_action)
+
+        remove_action = QAction("删除此服务器", menu)
+        remove_action.triggered.connect(lambda: self.manager.remove_server(self))
+        menu.addAction(remove_action)
+
+        menu.addSeparator()
+
+        quit_action = QAction("退出全部", menu)
+        quit_action.triggered.connect(QApplication.quit)
+        menu.addAction(quit_action)
+
+        self.setContextMenu(menu)
+
+    def poll(self):
+        """交给共享轮询服务在后台查询；本服务器已在轮询中时忽略"""
+        self.schedule_next_poll()
+        poller = self.manager.poller
+        # 长轮询已建立时由服务器推送状态，定时轮询只是回退手段
+        if poller.watch(self, self.ip, self.port, self.status_signal.emit):
+            return
+        # 轮询服务直连（不走系统代理）：开了代理时局域网 IP 走代理会连接失败；
+        # 离线的服务器用短超时探测，不长时间占用轮询线程
+        timeout = OFFLINE_PROBE_TIMEOUT if self.schedule.failures else None
+        poller.poll(self, self.ip, self.port, self.status_signal.emit, timeout)
+
+    def on_status(self, ok, count, message):
+        """轮询结果回调（运行在主线程）"""
+        recovered = ok and self.schedule.failures > 0
+        changed = self.has_result and (ok != self.online or count != self.count)
+        self.has_result = True
+        self.schedule.record(ok, changed)
+        # 结果改变了轮询间隔（进入退避或状态变化），从现在起重新计时
+        if changed or not ok:
+            self.schedule_next_poll()
+
+        self.online = ok
+        self.count = count
+        self.last_message = message if ok else f"连接失败 ({message})"
+        self.update_display()
+        if ok:
+            # 拿到完整响应后尝试切换到长轮询
+            self.manager.poller.watch(self, self.ip, self.port, self.status_signal.emit)
+        if recovered:
+            self.manager.on_peer_recovered(self)
+
+    def on_network_restored(self):
+        """网络恢复：离线的服务器不再等待退避，立即重新轮询"""
+        if self.schedule.failures:
+            self.schedule.reset_backoff()
+            self.poll()
+
+    def update_display(self):
+        """根据当前状态刷新图标和悬浮提示"""
+        if self.online:
+            # 在线：蓝色背景 + 文件数
+            icon = create_count_icon(self.count, QColor(0, 120, 215))
+        else:
+            # 离线：灰色背景 + 问号
+            icon = create_count_icon(0, QColor(120, 120, 120), text="?")
+        if icon is not self._icon:
+            self._icon = icon
+            self.setIcon(icon)
+        tooltip = self.tooltip_text()
+        if tooltip != self._tooltip:
+            self._tooltip = tooltip
+            self.setToolTip(tooltip)
+
+    def tooltip_text(self):
+        """悬浮提示：主机名、IP、端口、状态"""
+        return (
+            f"主机名: {self.hostname}\n"
+            f"IP: {self.ip}\n"
+            f"端口: {self.port}\n"
+            f"状态: {self.last_message}"
+        )
+
+    def open_web(self):
+        """在浏览器中打开服务器主页"""
+        webbrowser.open(f"http://{self.ip}:{self.port}/")
+
+
+class AppManager(QObject):
+    """统管本地截图托盘 + 所有远程服务器托盘，并负责持久化"""
+
+    def __init__(self):
+        super().__init__()
+        self.project_dir = Path(__file__).parent
+        self.servers_file = self.project_dir / "servers.json"
+        self.server_icons = []
+
+        # 所有服务器共用的轮询服务：有界线程池 + 按主机复用连接
+        self.poller = StatusPoller(max_workers=int(os.getenv('POLL_WORKERS', '4')))
+        QApplication.instance().aboutToQuit.connect(self.poller.shutdown)
+
+        # 本机网络恢复（如睡眠唤醒、重连 Wi-Fi）时立即重新轮询离线的服务器
+        self.network_manager = None
+        if QNetworkConfigurationManager is not None:
+            self.network_manager = QNetworkConfigurationManager()
+            self.network_manager.onlineStateChanged.connect(self.on_online_state_changed)
+
+        # 本地截图整理托盘（原有功能）
+        self.organizer = ScreenshotOrganizer()
+        self.organizer.add_server_requested.connect(self.add_server)
+
+        # 启动时恢复已保存的服务器
+        self.load_servers()
+
+    def on_online_state_changed(self, online):
+        """本机网络状态变化（运行在主线程）"""
+        if online:
+            print("网络已恢复，重新轮询离线的服务器")
+            for icon in self.server_icons:
+                icon.on_network_restored()
+
+    def on_peer_recovered(self, recovered):
+        """某台服务器从离线恢复，多半是本机网络恢复了：其他离线的服务器也立即重试"""
+        for icon in self.server_icons:
+            if icon is not recovered:
+                icon.on_network_restored()
+
+    def load_servers(self):
+        """从 servers.json 读取并重建服务器托盘图标"""
+        if not self.servers_file.exists():
+            return
+        try:
+            data = json.loads(self.servers_file.read_text(encoding="utf-8"))
+            for s in data:
+                self._create_icon(s["hostname"], s["ip"], s["port"])
+            print(f"已恢复 {len(data)} 个服务器")
+        except Exception as e:
+            print(f"加载服务器列表出错: {e}")
+
+    def save_servers(self):
+        """将当前服务器列表写入 servers.json"""
+        try:
+            data = [
+                {"hostname": i.hostname, "ip": i.ip, "port": i.port}
+                for i in self.server_icons
+            ]
+            self.servers_file.write_text(
+                json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+        except Exception as e:
+            print(f"保存服务器列表出错: {e}")
+
+    def _create_icon(self, hostname, ip, port):
+        start_delay_ms = (len(self.server_icons) * POLL_STAGGER_MS) % POLL_INTERVAL_MS
+        icon = ServerTrayIcon(self, hostname, ip, port, start_delay_ms=start_delay_ms)
+        self.server_icons.append(icon)
+        return icon
+
+    def add_server(self):
+        """弹出对话框新增一个服务器"""
+        dlg = ServerDialog(title="添加新的服务器")
+        if dlg.exec_() != QDialog.Accepted:
+            return
+
+        hostname, ip, port = dlg.get_values()
+        if not ip or not port:
+            QMessageBox.warning(None, "输入错误", "IP 和端口不能为空")
+            return
+        if not hostname:
+            hostname = ip
+
+        self._create_icon(hostname, ip, port)
+        self.save_servers()
+        self.organizer.showMessage(
+            "已添加服务器",
+            f"{hostname} ({ip}:{port})",
+            QSystemTrayIcon.Information,
+            2000,
+        )
+
+    def edit_server(self, icon):
+        """编辑已有服务器的信息"""
+        dlg = ServerDialog(
+            hostname=icon.hostname, ip=icon.ip, port=icon.port, title="编辑服务器"
+        )
+        if dlg.exec_() != QDialog.Accepted:
+            return
+
+        hostname, ip, port = dlg.get_values()
+        if not ip or not port:
+            QMessageBox.warning(None, "输入错误", "IP 和端口不能为空")
+            return
+
+        icon.hostname = hostname or ip
+        icon.ip = ip
+        icon.port = port
+        icon.update_display()
+        self.poller.forget(icon)
+        icon.schedule.reset()
+        icon.poll()
+        self.save_servers()
+
+    def remove_server(self, icon):
+        """删除一个服务器"""
+        reply = QMessageBox.question(
+            None,
+            "删除服务器",
+            f"确定删除服务器 {icon.hostname} ({icon.ip}:{icon.port}) 吗？",
+            QMessageBox.Yes | QMessageBox.No,
+        )
+        if reply != QMessageBox.Yes:
+            return
+
+        icon.start_timer.stop()
+        icon.timer.stop()
+        icon.hide()
+        self.poller.forget(icon)
+        if icon in self.server_icons:
+            self.server_icons.remove(icon)
+        icon.deleteLater()
+        self.save_servers()
+
+
+def main():
+    """主函数"""
+    app = QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)  # 关闭最后一个窗口时不退出
+
+    # 创建应用管理器（包含本地截图托盘 + 远程服务器托盘）
+    manager = AppManager()
+
+    sys.exit(app.exec_())
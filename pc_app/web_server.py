@@ -1,25 +1,196 @@
 """
 Screenshot Status Web Server
 提供截图状态查询的 Web API 服务
+
+默认使用 waitress（固定线程数的生产级 WSGI 服务器）运行，
+加 --dev 参数或未安装 waitress 时使用 Flask 开发服务器。
 """
 
-from flask import Flask, jsonify, send_file
+from flask import Flask, g, jsonify, send_file, request
 from flask_cors import CORS
 from pathlib import Path
+import argparse
+import hashlib
+import logging
+import multiprocessing
 import os
+import threading
+import time
 from datetime import datetime
-import re
 from dotenv import load_dotenv
 
+from api_encoding import (
+    COMPRESSIBLE_MIMETYPES, GZIP_MIN_BYTES, MSGPACK_MIMETYPES, STATUS_FRAME_MIMETYPE,
+    encode_status_frame, gzip_body, offered_mimetypes, pack_msgpack, parse_fields, project
+)
+from fleet import FleetAggregator
+from file_listing import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, FolderSizeCache, list_page
+from folder_index import MultiRootIndex
+from log_utils import setup_logging
+from metrics import INDEX_TOTAL_FILES, REGISTRY, REQUEST_LATENCY
+from organizer_engine import screenshot_roots
+from scanner import is_image_name
+from thumbnails import (
+    DEFAULT_THUMB_SIZE, MAX_THUMB_SIZE, MIN_THUMB_SIZE, THUMB_FORMATS, ThumbnailCache
+)
+
+try:
+    import waitress
+except ImportError:  # 未安装 waitress 时只能使用开发服务器
+    waitress = None
+
 # 加载 .env 文件
 load_dotenv(Path(__file__).parent / '.env')
 
+logger = logging.getLogger('web_server')
+
 app = Flask(__name__)
 CORS(app)  # 允许跨域访问
 
-# 从环境变量获取截图目录路径
-screenshots_env = os.getenv('SCREENSHOTS_PATH', '~/OneDrive/图片/Screenshots')
-screenshots_path = Path(screenshots_env).expanduser()
+# 截图目录 {名称: 路径}：.env 中的 SCREENSHOTS_PATHS（多个目录）或 SCREENSHOTS_PATH
+roots = screenshot_roots()
+
+
+# 归档文件夹计数索引：启动时统计一次，之后增量更新，/api/status 直接读取内存；
+# 所有目录共用一个索引（一个文件监听、一个对账线程，不同磁盘并行统计）
+folder_index = MultiRootIndex(
+    roots,
+    reconcile_interval=int(os.getenv('INDEX_RECONCILE_SECONDS', '300'))
+)
+# 各归档文件夹的字节数（按文件夹 mtime 缓存）
+folder_sizes = FolderSizeCache()
+
+# 缩略图磁盘缓存：目录、容量上限（MB）和生成进程数可在 .env 中配置
+thumbnail_cache = None
+
+# 缩略图进程池的子进程（Windows 下以 spawn 方式启动）会重新导入本模块，
+# 子进程只生成缩略图，不启动索引，也不创建缩略图缓存（创建时会清理缓存目录中的临时文件）
+if multiprocessing.parent_process() is None:
+    folder_index.start()
+    thumbnail_cache = ThumbnailCache(
+        os.getenv('THUMB_CACHE_DIR', str(Path(__file__).parent / 'thumb_cache')),
+        max_bytes=int(os.getenv('THUMB_CACHE_MB', '200')) * 1024 * 1024,
+        max_workers=int(os.getenv('THUMB_WORKERS', '2')),
+    )
+# 重复截图索引（与托盘程序共用同一个数据库），首次请求 /api/duplicates 时打开
+DEDUP_DB_PATH = Path(__file__).parent / 'dedup_index.db'
+duplicate_index = None
+duplicate_index_lock = threading.Lock()
+
+# 服务器汇总（FLEET_ENABLED=1 或 --fleet）：读取托盘程序保存的 servers.json，/api/fleet 返回所有机器的状态
+SERVERS_FILE = Path(__file__).parent / 'servers.json'
+fleet = None
+
+
+def enable_fleet():
+    global fleet
+    if fleet is None:
+        fleet = FleetAggregator(
+            SERVERS_FILE,
+            cache_ttl=float(os.getenv('FLEET_CACHE_SECONDS', '15')),
+            timeout=float(os.getenv('FLEET_TIMEOUT_SECONDS', '2')),
+        )
+
+
+if os.getenv('FLEET_ENABLED', '').strip().lower() in ('1', 'true', 'on', 'yes'):
+    enable_fleet()
+
+# 缩略图只由缓存键决定，浏览器可缓存一天，之后用 ETag 确认
+THUMB_MAX_AGE = 24 * 3600
+
+# 长轮询最长等待时间（秒），客户端超时后会立即重新发起
+LONG_POLL_TIMEOUT = 25
+
+# 服务器参数（.env）：监听地址、端口、工作线程数、最大连接数
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '5001'))
+SERVER_THREADS = int(os.getenv('SERVER_THREADS', '16'))
+SERVER_CONNECTION_LIMIT = int(os.getenv('SERVER_CONNECTION_LIMIT', '200'))
+
+# 长轮询会占住工作线程，最多只让一半线程用于等待，其余留给普通请求；
+# 名额用完时按普通请求立即返回，客户端随之退回定时轮询
+long_poll_slots = threading.BoundedSemaphore(max(1, SERVER_THREADS // 2))
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_latency(response):
+    """按路由模板记录请求耗时（未匹配的路径归为 unmatched，避免标签无限增长）
+    长轮询请求大多等待到超时，标记为 mode="wait"，不与普通请求的延迟混在一起
+    """
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - started,
+            endpoint=endpoint,
+            method=request.method,
+            status=response.status_code,
+            mode='wait' if g.get('long_poll') else 'normal',
+        )
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """客户端接受 gzip 时压缩较大的 JSON / msgpack / 文本响应（缩略图等文件响应不处理）"""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES or response.direct_passthrough:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+            or request.accept_encodings['gzip'] <= 0):
+        return response
+    body = response.get_data()
+    if len(body) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip_body(body))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def api_response(data, status_frame=None):
+    """
+    按请求生成 API 响应：?fields= 裁剪字段，Accept 选择编码（默认 JSON）
+    status_frame: (has_folders, total_count)，提供时可返回固定布局的二进制帧
+    """
+    fields = request.args.get('fields')
+    if fields:
+        data = project(data, parse_fields(fields))
+    mimetype = request.accept_mimetypes.best_match(
+        offered_mimetypes(status_frame is not None), default='application/json'
+    )
+    if mimetype == STATUS_FRAME_MIMETYPE:
+        response = app.response_class(encode_status_frame(*status_frame), mimetype=mimetype)
+    elif mimetype in MSGPACK_MIMETYPES:
+        response = app.response_class(pack_msgpack(data), mimetype=mimetype)
+    else:
+        response = jsonify(data)
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
+
+def etag_value(text):
+    """去掉 ETag 的 W/ 前缀和引号（?wait= 参数可能带有这些字符）"""
+    if text.startswith('W/'):
+        text = text[2:]
+    return text.strip('"')
+
+
+def not_modified(etag):
+    """
+    条件请求命中时的 304 响应
+    API 的 ETag 都是弱 ETag：同一状态可能以 JSON / msgpack / 二进制帧 / gzip 等不同字节返回，
+    响应中的 timestamp 也会变化，只保证语义相同
+    """
+    response = app.response_class(status=304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
 
 
 def check_has_folders():
@@ -27,60 +198,233 @@ def check_has_folders():
     检查 Screenshots 目录中是否存在由 screenshot_organizer.py 创建的文件夹
     返回: (has_folders, total_count)
         has_folders: True (有文件夹) 或 False (无文件夹)
-        total_count: 所有文件夹中的文件总数
+        total_count: 所有目录、所有文件夹中的文件总数
     """
-    try:
-        if not screenshots_path.exists():
-            return False, 0
-
-        # 查找符合时间格式的文件夹（如 "05-06", "14-15" 等）或 "已到期" 文件夹
-        import re
-        time_folder_pattern = re.compile(r'^\d{2}-\d{2}$')  # 匹配 "HH-HH" 格式
+    return folder_index.snapshot()
 
-        has_folders = False
-        total_count = 0
 
-        for item in screenshots_path.iterdir():
-            # 检查是否是文件夹
-            if item.is_dir():
-                # 检查文件夹名是否符合时间格式或是 "已到期" 文件夹
-                if time_folder_pattern.match(item.name) or item.name == "已到期":
-                    print(f"发现文件夹: {item.name}")
-                    has_folders = True
+def resolve_root():
+    """请求参数 root 对应的 (名称, 目录)；未指定时为第一个目录，未知时返回 (名称, None)"""
+    name = request.args.get('root') or folder_index.default_root
+    return name, roots.get(name)
 
-                    # 统计该文件夹中的文件数量
-                    folder_file_count = sum(1 for f in item.iterdir() if f.is_file())
-                    total_count += folder_file_count
-                    print(f"  文件夹 {item.name} 包含 {folder_file_count} 个文件")
 
-        print(f"总共发现 {total_count} 个文件")
-        return has_folders, total_count
-
-    except Exception as e:
-        print(f"检查状态时出错: {e}")
-        return False, 0
+def archive_file_path(root_path, folder, name):
+    """
+    归档文件夹中指定文件的路径；文件名包含路径分隔符、".."、盘符或不在文件夹内时返回 None
+    （Windows 下反斜杠也是分隔符，"..\\..\\x.png" 会跳出截图目录）
+    """
+    if not name or '..' in name or any(c in name for c in '\\/:\0'):
+        return None
+    folder_path = (root_path / folder).resolve()
+    path = (folder_path / name).resolve()
+    if path.parent != folder_path:
+        return None
+    return path
 
 
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """
     获取截图状态 API
-    返回: {"status": "has"/"none", "totalCount": 数量}
+    返回: {"status": "has"/"none", "totalCount": 合计数量,
+           "roots": [{"name": 目录名称, "status": "has"/"none", "totalCount": 数量}, ...]}
+    支持条件请求：If-None-Match 与当前（弱）ETag 相同时返回 304，不生成响应体
+    长轮询：?wait=<etag>&timeout=<秒> 会阻塞到状态变化或超时（超时返回 304）
+    紧凑编码：?fields=status,totalCount 只返回需要的字段；Accept: application/msgpack 返回 MessagePack，
+    Accept: application/vnd.screenshot-status 返回 6 字节的二进制帧（版本、状态、文件总数）
     """
-    print("=== 收到 /api/status 请求 ===")
-    has_files, total_count = check_has_folders()
-    print(f"检测结果: has_files = {has_files}, total_count = {total_count}")
+    logger.debug("收到 /api/status 请求: %s", request.remote_addr)
+    wait = request.args.get('wait')
+    if wait and long_poll_slots.acquire(blocking=False):
+        g.long_poll = True
+        try:
+            timeout = request.args.get('timeout', LONG_POLL_TIMEOUT, type=float)
+            timeout = max(0.0, min(timeout, LONG_POLL_TIMEOUT))
+            has_files, total_count, root_counts, etag = folder_index.wait_for_change(
+                etag_value(wait), timeout
+            )
+        finally:
+            long_poll_slots.release()
+    else:
+        has_files, total_count, root_counts, etag = folder_index.status()
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
     status = "has" if has_files else "none"
 
     response = {
         "status": status,
         "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         "message": f"有已整理的截图，共 {total_count} 个文件" if has_files else "无已整理的截图",
-        "totalCount": total_count
+        "totalCount": total_count,
+        "roots": [
+            {"name": name, "status": "has" if has else "none", "totalCount": count}
+            for name, (has, count) in root_counts.items()
+        ]
     }
 
-    print(f"返回响应: {response}")
-    return jsonify(response)
+    logger.debug("返回响应: %s", response)
+    response = api_response(response, status_frame=(has_files, total_count))
+    response.set_etag(etag, weak=True)
+    # 客户端可以缓存，但每次都需用 If-None-Match 向服务器确认
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/api/folders', methods=['GET'])
+def get_folders():
+    """
+    各归档文件夹的文件数和字节数
+    参数: root=目录名称（可选，省略时列出所有目录）
+    返回: {"folders": [{"root": 目录名称, "name": 文件夹名, "count": 文件数, "bytes": 字节数}, ...], "totalCount": 总数}
+    分片文件夹以 "已到期/YYYY-MM" 的形式列出
+    """
+    selected = request.args.get('root')
+    if selected is not None and selected not in roots:
+        return jsonify({"error": f"未知的目录: {selected}"}), 404
+    folders = []
+    for root_name, root_path in roots.items():
+        if selected is not None and root_name != selected:
+            continue
+        for name, count in sorted(folder_index.folder_counts(root_name).items()):
+            try:
+                size = folder_sizes.size(root_path / name)
+            except OSError:
+                # 文件夹刚被删除，索引尚未更新
+                continue
+            folders.append({"root": root_name, "name": name, "count": count, "bytes": size})
+    return api_response({
+        "folders": folders,
+        "totalCount": sum(folder["count"] for folder in folders)
+    })
+
+
+@app.route('/api/files', methods=['GET'])
+def get_files():
+    """
+    分页列出归档文件夹中的文件（按文件名排序）
+    参数: folder=文件夹名（/api/folders 中的 name）, root=目录名称（省略时为第一个目录）,
+          cursor=上一页返回的 nextCursor, limit=每页数量
+    返回: {"folder": 文件夹名, "files": [{"name", "size", "mtime"}, ...], "nextCursor": 游标或 null}
+    """
+    root_name, root_path = resolve_root()
+    if root_path is None:
+        return jsonify({"error": f"未知的目录: {root_name}"}), 404
+    folder = request.args.get('folder', '')
+    if folder not in folder_index.folder_counts(root_name):
+        return jsonify({"error": f"未知的文件夹: {folder}"}), 404
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    try:
+        files, next_cursor = list_page(root_path / folder, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({"error": f"文件夹不存在: {folder}"}), 404
+    return api_response({"folder": folder, "files": files, "nextCursor": next_cursor})
+
+
+@app.route('/api/thumb/<path:relpath>', methods=['GET'])
+def get_thumbnail(relpath):
+    """
+    归档截图的缩略图：/api/thumb/<文件夹>/<文件名>?size=<边长>&format=webp|jpeg
+    未指定 format 时，Accept 中包含 image/webp 则返回 WebP，否则返回 JPEG；多个目录时用 root=目录名称 选择目录
+    """
+    if not ThumbnailCache.available():
+        return jsonify({"error": "服务器未安装 Pillow，无法生成缩略图"}), 503
+
+    root_name, root_path = resolve_root()
+    if root_path is None:
+        return jsonify({"error": f"未知的目录: {root_name}"}), 404
+    folder, _, name = relpath.rpartition('/')
+    if folder not in folder_index.folder_counts(root_name) or not is_image_name(name):
+        return jsonify({"error": f"未知的文件: {relpath}"}), 404
+    src = archive_file_path(root_path, folder, name)
+    if src is None:
+        return jsonify({"error": f"未知的文件: {relpath}"}), 404
+
+    size = request.args.get('size', DEFAULT_THUMB_SIZE, type=int)
+    size = max(MIN_THUMB_SIZE, min(size, MAX_THUMB_SIZE))
+    fmt = request.args.get('format')
+    if fmt is None:
+        accepted = {mimetype for mimetype, quality in request.accept_mimetypes if quality > 0}
+        fmt = 'webp' if 'image/webp' in accepted else 'jpeg'
+    elif fmt not in THUMB_FORMATS:
+        return jsonify({"error": f"不支持的格式: {fmt}"}), 400
+
+    try:
+        thumb_path, key = thumbnail_cache.get(src, size, fmt)
+    except FileNotFoundError:
+        return jsonify({"error": f"文件不存在: {relpath}"}), 404
+    except Exception as e:
+        logger.warning("生成缩略图失败 %s: %s", relpath, e)
+        return jsonify({"error": f"无法生成缩略图: {relpath}"}), 415
+
+    # send_file 返回文件包装器，waitress 直接分块发送文件，不把整个文件读入内存
+    response = send_file(
+        thumb_path,
+        mimetype=THUMB_FORMATS[fmt][1],
+        etag=key,
+        max_age=THUMB_MAX_AGE,
+        conditional=True,
+    )
+    response.headers['Vary'] = 'Accept'
+    return response
+
+
+@app.route('/api/duplicates', methods=['GET'])
+def get_duplicates():
+    """
+    托盘程序整理时记录的重复截图
+    返回: {"exact": [[路径, ...], ...], "near": [[路径, ...], ...], "exactGroups": 组数, "nearGroups": 组数}
+    """
+    global duplicate_index
+    # numpy / Pillow 导入较慢，首次请求时才导入
+    import dedup
+    if not dedup.available():
+        return jsonify({"error": "服务器未安装 Pillow / numpy，无法检测重复"}), 503
+    with duplicate_index_lock:
+        if duplicate_index is None:
+            duplicate_index = dedup.DuplicateIndex(DEDUP_DB_PATH)
+    groups = duplicate_index.duplicate_groups()
+    return api_response({
+        "exact": groups["exact"],
+        "near": groups["near"],
+        "exactGroups": len(groups["exact"]),
+        "nearGroups": len(groups["near"])
+    })
+
+
+@app.route('/api/fleet', methods=['GET'])
+def get_fleet():
+    """
+    servers.json 中所有服务器的状态（并行查询，结果缓存 FLEET_CACHE_SECONDS 秒）
+    返回: {"servers": [{"hostname", "ip", "port", "online", "status": "has"/"none"/"offline",
+                       "totalCount", "message", "updated", "stale"}, ...],
+           "totalCount": 在线服务器的合计, "timestamp": 时间}
+    未及时响应的服务器返回上次的结果并标记 stale；支持 If-None-Match（弱 ETag，只由在线状态和数量决定）
+    """
+    if fleet is None:
+        return jsonify({"error": "未启用服务器汇总（在 .env 中设置 FLEET_ENABLED=1 或使用 --fleet 启动）"}), 404
+
+    servers = fleet.status()
+    digest = hashlib.blake2b(digest_size=8)
+    for server in servers:
+        digest.update(f"{server['ip']}:{server['port']}:{server['status']}:{server['totalCount']};".encode())
+    etag = digest.hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
+    response = api_response({
+        "servers": servers,
+        "totalCount": sum(server["totalCount"] for server in servers if server["online"]),
+        "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 @app.route('/api/health', methods=['GET'])
@@ -93,6 +437,17 @@ def health_check():
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 文本格式的运行指标"""
+    _, total_count = check_has_folders()
+    INDEX_TOTAL_FILES.set(total_count)
+    return app.response_class(
+        REGISTRY.render(),
+        mimetype='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
 @app.route('/favicon.ico')
 def favicon():
     """网站图标"""
@@ -114,20 +469,55 @@ def index():
         <h1>截图状态服务器</h1>
         <p>API 端点：</p>
         <ul>
-            <li><a href="/api/status">/api/status</a> - 获取截图状态</li>
+            <li><a href="/api/status">/api/status</a> - 获取截图状态，含各目录和合计数量（?wait=&lt;etag&gt; 长轮询，状态变化时立即返回）</li>
+            <li><a href="/api/folders">/api/folders</a> - 各目录中归档文件夹的文件数和字节数（?root=&lt;目录&gt;）</li>
+            <li>/api/files?root=&lt;目录&gt;&amp;folder=&lt;文件夹&gt;&amp;cursor=&amp;limit= - 分页列出文件夹中的文件</li>
+            <li>/api/thumb/&lt;文件夹&gt;/&lt;文件名&gt;?size=256 - 归档截图的缩略图（WebP / JPEG）</li>
+            <li><a href="/api/duplicates">/api/duplicates</a> - 重复和近似重复的截图</li>
+            <li><a href="/api/fleet">/api/fleet</a> - servers.json 中所有服务器的状态（需启用 FLEET_ENABLED）</li>
             <li><a href="/api/health">/api/health</a> - 健康检查</li>
+            <li>所有 /api 接口支持 ?fields= 裁剪字段、Accept: application/msgpack；较大的响应在 Accept-Encoding: gzip 时压缩</li>
+            <li><a href="/metrics">/metrics</a> - 运行指标（Prometheus 文本格式）</li>
         </ul>
     </body>
     </html>
     """
 
 
+def main():
+    """启动服务器"""
+    parser = argparse.ArgumentParser(description="截图状态 Web 服务器")
+    parser.add_argument('--dev', action='store_true', help="使用 Flask 开发服务器（每个连接一个线程）")
+    parser.add_argument('--fleet', action='store_true', help="启用 /api/fleet，汇总 servers.json 中所有服务器的状态")
+    args = parser.parse_args()
+    if args.fleet:
+        enable_fleet()
+
+    setup_logging()
+    logger.info("启动截图状态 Web 服务器...")
+    for name, path in roots.items():
+        logger.info("监控目录 [%s]: %s", name, path)
+    logger.info("API 端点: http://%s:%s/api/status", SERVER_HOST, SERVER_PORT)
+    if fleet is not None:
+        logger.info("服务器汇总: http://%s:%s/api/fleet (%s)", SERVER_HOST, SERVER_PORT, SERVERS_FILE)
+
+    # 监听所有网络接口，以便局域网访问
+    if args.dev or waitress is None:
+        if waitress is None and not args.dev:
+            logger.warning("未安装 waitress，改用 Flask 开发服务器")
+        # threaded=True: 启用多线程，支持多个客户端同时连接
+        app.run(host=SERVER_HOST, port=SERVER_PORT, debug=False, threaded=True)
+    else:
+        logger.info("使用 waitress 运行: %s 个工作线程, 最多 %s 个连接",
+                    SERVER_THREADS, SERVER_CONNECTION_LIMIT)
+        waitress.serve(
+            app,
+            host=SERVER_HOST,
+            port=SERVER_PORT,
+            threads=SERVER_THREADS,
+            connection_limit=SERVER_CONNECTION_LIMIT,
+        )
+
+
 if __name__ == '__main__':
-    print("启动截图状态 Web 服务器...")
-    print(f"监控目录: {screenshots_path}")
-    print(f"服务器运行在: http://0.0.0.0:5001")
-    print("API 端点: http://0.0.0.0:5001/api/status")
-
-    # 运行服务器（监听所有网络接口，以便局域网访问）
-    # threaded=True: 启用多线程，支持多个客户端同时连接
-    app.run(host='0.0.0.0', port=5001, debug=False, threaded=True)
+    main()